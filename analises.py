@@ -0,0 +1,309 @@
+"""
+Motor de análises para o dashboard do professor
+Mantém um snapshot colunar (arrays NumPy) das tabelas de atividades e calcula
+distribuições, percentis, agregados por escola/série e tendências com
+operações vetorizadas. O snapshot é atualizado de forma incremental pelo id,
+em uma thread de fundo: as requisições recebem o último resultado calculado.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+# Intervalo mínimo entre duas consultas de atualização ao banco (segundos)
+INTERVALO_ATUALIZACAO = 10
+DIAS_TENDENCIA = 30
+FAIXAS_HISTOGRAMA = 10
+PERCENTIS = (25, 50, 75, 90)
+
+# Cada consulta devolve (id, usuario_id, pontuacao, quantidade, dia) com dia em dias desde 1970
+CONSULTAS = {
+    'matematica': '''
+        SELECT id, usuario_id, pontuacao, 1,
+               COALESCE(CAST(strftime('%s', date(data_jogo)) AS INTEGER) / 86400, 0)
+        FROM resultados_matematica WHERE id > ? ORDER BY id
+    ''',
+    'avaliacao_ia': '''
+        SELECT id, usuario_id, COALESCE(pontuacao, 0), 1,
+               COALESCE(CAST(strftime('%s', date(data_avaliacao)) AS INTEGER) / 86400, 0)
+        FROM avaliacoes_ia WHERE id > ? ORDER BY id
+    ''',
+    'robotica': '''
+        SELECT id, usuario_id, COALESCE(nota, 0), 1,
+               COALESCE(CAST(strftime('%s', date(data_cadastro)) AS INTEGER) / 86400, 0)
+        FROM projetos_robotica WHERE id > ? ORDER BY id
+    ''',
+}
+
+# Resumos do arquivamento: crescem com o histórico, então só são recarregados
+# quando a versão 'arquivamento' (em versoes_dados) muda
+CONSULTA_RESUMO = '''
+    SELECT 0, usuario_id, pontuacao, quantidade,
+           CAST(strftime('%s', dia) AS INTEGER) / 86400
+    FROM resumo_matematica_diario
+'''
+
+ID, USUARIO, PONTUACAO, QUANTIDADE, DIA = range(5)
+
+
+def _carregar(cursor, sql, params=()):
+    cursor.execute(sql, params)
+    linhas = cursor.fetchall()
+    if not linhas:
+        return np.empty((0, 5), dtype=np.int64)
+    return np.array(linhas, dtype=np.int64)
+
+
+def _percentis_por_grupo(grupos, valores, num_grupos, qs):
+    """Percentis (interpolação linear) de cada grupo sem laço em Python"""
+    ordem = np.lexsort((valores, grupos))
+    ordenados = valores[ordem].astype(np.float64)
+    contagens = np.bincount(grupos, minlength=num_grupos)
+    inicios = np.concatenate(([0], np.cumsum(contagens)[:-1]))
+    vazios = contagens == 0
+
+    resultado = {}
+    for q in qs:
+        pos = inicios + (q / 100) * np.maximum(contagens - 1, 0)
+        baixo = np.floor(pos).astype(np.int64)
+        alto = np.ceil(pos).astype(np.int64)
+        if len(ordenados):
+            baixo = np.minimum(baixo, len(ordenados) - 1)
+            alto = np.minimum(alto, len(ordenados) - 1)
+            valor = ordenados[baixo] + (ordenados[alto] - ordenados[baixo]) * (pos - np.floor(pos))
+        else:
+            valor = np.zeros(num_grupos)
+        resultado[q] = np.where(vazios, 0.0, valor)
+    return resultado
+
+
+class SnapshotAnalitico:
+    def __init__(self, db):
+        self.db = db
+        self.lock = threading.Lock()
+        self.atualizado_em = 0
+        self._resultado = None
+        self._versao_resultado = None
+        self._thread = None
+        self._lock_thread = threading.Lock()
+        self._limpar()
+
+    def _limpar(self):
+        self.ultimo_id = {'usuarios': 0, **{tabela: 0 for tabela in CONSULTAS}}
+        self.dados = {tabela: np.empty((0, 5), dtype=np.int64) for tabela in CONSULTAS}
+        self.resumo = np.empty((0, 5), dtype=np.int64)
+        self.versao_arquivamento = None
+
+        # Atributos dos usuários indexados pelo próprio id
+        self.usuario_escola = np.zeros(1, dtype=np.int64)
+        self.usuario_serie = np.zeros(1, dtype=np.int64)
+        self.usuario_aluno = np.zeros(1, dtype=bool)
+        self.escolas = ['']
+        self.series = ['']
+        self._codigo_escola = {'': 0}
+        self._codigo_serie = {'': 0}
+
+    def _codigo(self, valor, nomes, codigos):
+        if valor not in codigos:
+            codigos[valor] = len(nomes)
+            nomes.append(valor)
+        return codigos[valor]
+
+    def _atualizar_usuarios(self, cursor):
+        cursor.execute('SELECT id, escola, serie, tipo FROM usuarios WHERE id > ? ORDER BY id',
+                       (self.ultimo_id['usuarios'],))
+        linhas = cursor.fetchall()
+        if not linhas:
+            return
+
+        tamanho = linhas[-1][0] + 1
+        if tamanho > len(self.usuario_aluno):
+            extra = tamanho - len(self.usuario_aluno)
+            self.usuario_escola = np.concatenate((self.usuario_escola, np.zeros(extra, dtype=np.int64)))
+            self.usuario_serie = np.concatenate((self.usuario_serie, np.zeros(extra, dtype=np.int64)))
+            self.usuario_aluno = np.concatenate((self.usuario_aluno, np.zeros(extra, dtype=bool)))
+
+        for user_id, escola, serie, tipo in linhas:
+            self.usuario_escola[user_id] = self._codigo(escola, self.escolas, self._codigo_escola)
+            self.usuario_serie[user_id] = self._codigo(serie, self.series, self._codigo_serie)
+            self.usuario_aluno[user_id] = tipo == 'aluno'
+        self.ultimo_id['usuarios'] = linhas[-1][0]
+
+    def atualizar(self, forcar=False):
+        """Carrega apenas as linhas novas desde a última atualização"""
+        with self.lock:
+            if not forcar and time.time() - self.atualizado_em < INTERVALO_ATUALIZACAO:
+                return
+
+            conn = self.db.get_connection()
+            conn.row_factory = None  # tuplas simples: conversão direta para arrays
+            cursor = conn.cursor()
+            cursor.execute('BEGIN')  # leituras consistentes com a versão do arquivamento
+
+            # O arquivamento moveu linhas quentes para os resumos: recarrega só a matemática
+            cursor.execute("SELECT versao FROM versoes_dados WHERE dominio = 'arquivamento'")
+            row = cursor.fetchone()
+            versao_arquivamento = row[0] if row else 0
+            if versao_arquivamento != self.versao_arquivamento:
+                self.dados['matematica'] = np.empty((0, 5), dtype=np.int64)
+                self.ultimo_id['matematica'] = 0
+                self.resumo = _carregar(cursor, CONSULTA_RESUMO)
+                self.versao_arquivamento = versao_arquivamento
+
+            self._atualizar_usuarios(cursor)
+            for tabela, sql in CONSULTAS.items():
+                novos = _carregar(cursor, sql, (self.ultimo_id[tabela],))
+                if len(novos):
+                    self.dados[tabela] = np.concatenate((self.dados[tabela], novos))
+                    self.ultimo_id[tabela] = int(novos[-1, ID])
+
+            conn.commit()
+            conn.close()
+            self.atualizado_em = time.time()
+
+    def _versao(self):
+        return (tuple(self.ultimo_id.values()), self.versao_arquivamento)
+
+    def recalcular(self):
+        """Atualiza o snapshot e recalcula as análises (reaproveitadas se nada mudou)"""
+        self.atualizar()
+        with self.lock:
+            versao = self._versao()
+            if self._resultado is None or versao != self._versao_resultado:
+                self._resultado = self._calcular()
+                self._versao_resultado = versao
+            return self._resultado
+
+    def aquecer(self):
+        """Inicia a atualização em uma thread de fundo (se nenhuma estiver rodando)"""
+        with self._lock_thread:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.recalcular, name='snapshot-analitico', daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def calcular(self):
+        """Último resultado calculado; se estiver velho, a atualização roda em segundo plano"""
+        if self._resultado is None:
+            # Ainda não aquecido: espera a carga em andamento (ou faz nesta requisição, se ela falhou)
+            self.aquecer().join()
+            if self._resultado is None:
+                return self.recalcular()
+        elif time.time() - self.atualizado_em >= INTERVALO_ATUALIZACAO:
+            self.aquecer()
+        return self._resultado
+
+    def _calcular(self):
+        num_usuarios = len(self.usuario_aluno)
+        matematica = np.concatenate((self.dados['matematica'], self.resumo))
+        avaliacoes = self.dados['avaliacao_ia']
+        robotica = self.dados['robotica']
+
+        def por_usuario(dados, coluna):
+            return np.bincount(dados[:, USUARIO], weights=dados[:, coluna], minlength=num_usuarios)[:num_usuarios]
+
+        pontos_mat = por_usuario(matematica, PONTUACAO)
+        pontos_ia = por_usuario(avaliacoes, PONTUACAO)
+        pontos_rob = por_usuario(robotica, PONTUACAO)
+        qtd_ia = por_usuario(avaliacoes, QUANTIDADE)
+        qtd_rob = por_usuario(robotica, QUANTIDADE)
+        total = pontos_mat + pontos_ia + pontos_rob
+
+        alunos = np.flatnonzero(self.usuario_aluno)
+        totais_alunos = total[alunos]
+
+        # Distribuição da pontuação total dos alunos
+        if len(totais_alunos):
+            contagens, bordas = np.histogram(totais_alunos, bins=FAIXAS_HISTOGRAMA)
+        else:
+            contagens, bordas = np.zeros(FAIXAS_HISTOGRAMA, dtype=np.int64), np.zeros(FAIXAS_HISTOGRAMA + 1)
+        distribuicao = {
+            'faixas': [f'{int(bordas[i])}–{int(bordas[i + 1])}' for i in range(len(contagens))],
+            'contagens': contagens.tolist()
+        }
+
+        def percentis(valores):
+            if len(valores) == 0:
+                return {f'p{q}': 0 for q in PERCENTIS}
+            return {f'p{q}': round(float(v), 1) for q, v in zip(PERCENTIS, np.percentile(valores, PERCENTIS))}
+
+        return {
+            'distribuicao': distribuicao,
+            'percentis': {
+                'total': percentis(totais_alunos),
+                'matematica': percentis(pontos_mat[alunos]),
+                'avaliacao_ia': percentis(avaliacoes[:, PONTUACAO]),
+                'robotica': percentis(robotica[:, PONTUACAO]),
+            },
+            'por_escola': self._agregar(self.usuario_escola, self.escolas, alunos, total,
+                                        pontos_mat, pontos_ia, qtd_ia, pontos_rob, qtd_rob),
+            'por_serie': self._agregar(self.usuario_serie, self.series, alunos, total,
+                                       pontos_mat, pontos_ia, qtd_ia, pontos_rob, qtd_rob),
+            'tendencia': self._tendencia(matematica, avaliacoes, robotica),
+        }
+
+    def _agregar(self, codigos, nomes, alunos, total, pontos_mat, pontos_ia, qtd_ia, pontos_rob, qtd_rob):
+        """Agregados por grupo (escola ou série) considerando apenas alunos"""
+        num_grupos = len(nomes)
+        grupos = codigos[alunos]
+
+        def soma(valores):
+            return np.bincount(grupos, weights=valores[alunos], minlength=num_grupos)
+
+        num_alunos = np.bincount(grupos, minlength=num_grupos)
+        soma_total = soma(total)
+        soma_mat = soma(pontos_mat)
+        soma_ia, soma_qtd_ia = soma(pontos_ia), soma(qtd_ia)
+        soma_rob, soma_qtd_rob = soma(pontos_rob), soma(qtd_rob)
+        quantis = _percentis_por_grupo(grupos, total[alunos], num_grupos, (50, 90))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            media_total = np.where(num_alunos > 0, soma_total / num_alunos, 0)
+            media_ia = np.where(soma_qtd_ia > 0, soma_ia / soma_qtd_ia, 0)
+            media_rob = np.where(soma_qtd_rob > 0, soma_rob / soma_qtd_rob, 0)
+
+        linhas = [{
+            'grupo': nomes[g],
+            'alunos': int(num_alunos[g]),
+            'pontuacao_total': int(soma_total[g]),
+            'pontos_matematica': int(soma_mat[g]),
+            'media_total': round(float(media_total[g]), 1),
+            'mediana_total': round(float(quantis[50][g]), 1),
+            'p90_total': round(float(quantis[90][g]), 1),
+            'media_avaliacao_ia': round(float(media_ia[g]), 1),
+            'media_robotica': round(float(media_rob[g]), 1),
+        } for g in np.flatnonzero(num_alunos)]
+        linhas.sort(key=lambda linha: linha['pontuacao_total'], reverse=True)
+        return linhas
+
+    def _tendencia(self, matematica, avaliacoes, robotica):
+        """Pontos de matemática e atividades por dia nos últimos DIAS_TENDENCIA dias"""
+        hoje = int(time.time() // 86400)
+        inicio = hoje - DIAS_TENDENCIA + 1
+
+        def por_dia(dados, coluna):
+            recentes = dados[dados[:, DIA] >= inicio]
+            return np.bincount(recentes[:, DIA] - inicio, weights=recentes[:, coluna],
+                               minlength=DIAS_TENDENCIA)[:DIAS_TENDENCIA]
+
+        atividades = (por_dia(matematica, QUANTIDADE) + por_dia(avaliacoes, QUANTIDADE)
+                      + por_dia(robotica, QUANTIDADE))
+        dias = np.arange(inicio, hoje + 1).astype('datetime64[D]')
+        return {
+            'dias': [str(d)[5:] for d in dias],
+            'pontos_matematica': por_dia(matematica, PONTUACAO).astype(int).tolist(),
+            'atividades': atividades.astype(int).tolist(),
+        }
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+
+
+def obter_snapshot(db):
+    """Snapshot compartilhado (por processo) para o banco informado"""
+    with _snapshots_lock:
+        if db.db_path not in _snapshots:
+            _snapshots[db.db_path] = SnapshotAnalitico(db)
+        return _snapshots[db.db_path]
@@ -3,12 +3,23 @@ CEITEC HUB - Plataforma Educacional Integrada
 Desenvolvido para o Centro de Inovação em Tecnologia e Educação do Ceará
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g
 from functools import wraps
+import asyncio
+import click
+import json
 import os
+import uuid
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from models import Database
+from async_db import AsyncDatabase
+from limites import Limitador, LIMITES_PADRAO
+from analises import obter_snapshot
+import assets
+from fragmentos import CacheFragmentos
+from cache_avaliacoes import CacheAvaliacoes, normalizar_texto, CACHE_AVALIACOES_MAX_PERSISTENTE
+from fila import Fila, tarefa, iniciar_workers
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'ceitec-hub-secret-key-2024')
@@ -21,11 +32,35 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 # Garantir que pasta de uploads existe
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Limites de admissão (sobrescreva com LIMITES='{"avaliacao": {"taxa": 0.5}}')
+app.config['LIMITES'] = {classe: dict(valores) for classe, valores in LIMITES_PADRAO.items()}
+for classe, valores in json.loads(os.environ.get('LIMITES', '{}')).items():
+    app.config['LIMITES'].setdefault(classe, {}).update(valores)
+
+# Com FILA_AVALIACOES=1 as avaliações são gravadas pelos workers (flask --app app worker)
+app.config['FILA_AVALIACOES'] = os.environ.get('FILA_AVALIACOES', '0') == '1'
+
 db = Database()
+adb = AsyncDatabase(db)
+limitador = Limitador()
+fila = Fila()
+
+# HTML renderizado de trechos de página; escritas no banco descartam os fragmentos afetados
+cache_fragmentos = CacheFragmentos()
+db.ao_alterar(cache_fragmentos.invalidar)
 
 # ==================== DECORATORS ====================
 
 def login_required(f):
+    if asyncio.iscoroutinefunction(f):
+        @wraps(f)
+        async def decorated_async(*args, **kwargs):
+            if 'user_id' not in session:
+                flash('Por favor, faça login para acessar esta página.', 'warning')
+                return redirect(url_for('login'))
+            return await f(*args, **kwargs)
+        return decorated_async
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
@@ -46,6 +81,54 @@ def professor_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _admitir(classe):
+    """Aplica os limites da classe; retorna (resposta de recusa ou None, token da vaga)"""
+    config = app.config['LIMITES'][classe]
+    chave = f"{session.get('user_id')}:{request.endpoint}"
+    
+    permitido, espera = limitador.consumir(chave, config['taxa'], config['capacidade'])
+    if not permitido:
+        resposta = jsonify({'erro': 'Muitas requisições. Tente novamente em instantes.'})
+        resposta.status_code = 429
+        resposta.headers['Retry-After'] = str(espera)
+        return resposta, None
+    
+    token = limitador.adquirir(classe, config['concorrencia'])
+    if token is None:
+        resposta = jsonify({'erro': 'Servidor ocupado. Tente novamente em instantes.'})
+        resposta.status_code = 503
+        resposta.headers['Retry-After'] = '1'
+        return resposta, None
+    
+    return None, token
+
+def limitar(classe):
+    """Limite de taxa por usuário/rota e de concorrência por classe de rota"""
+    def decorator(f):
+        if asyncio.iscoroutinefunction(f):
+            @wraps(f)
+            async def decorated_async(*args, **kwargs):
+                recusa, token = _admitir(classe)
+                if recusa is not None:
+                    return recusa
+                try:
+                    return await f(*args, **kwargs)
+                finally:
+                    limitador.liberar(token)
+            return decorated_async
+        
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            recusa, token = _admitir(classe)
+            if recusa is not None:
+                return recusa
+            try:
+                return f(*args, **kwargs)
+            finally:
+                limitador.liberar(token)
+        return decorated_function
+    return decorator
+
 # ==================== ROTAS DE AUTENTICAÇÃO ====================
 
 @app.route('/')
@@ -122,6 +205,7 @@ def matematica():
 
 @app.route('/matematica/questao', methods=['POST'])
 @login_required
+@limitar('matematica')
 def gerar_questao():
     import random
     
@@ -192,10 +276,12 @@ def responder_questao():
 
 @app.route('/matematica/ranking')
 @login_required
-def ranking_matematica():
-    ranking_geral = db.get_ranking_geral()
-    user = db.get_user_by_id(session['user_id'])
-    ranking_escola = db.get_ranking_por_escola(user['escola'])
+async def ranking_matematica():
+    user, ranking_geral, ranking_escola = await adb.gather(
+        adb.get_user_by_id(session['user_id']),
+        adb.get_ranking_geral(),
+        adb.get_ranking_escola_do_usuario(session['user_id'])
+    )
     
     return jsonify({
         'geral': ranking_geral,
@@ -212,29 +298,50 @@ def avaliacao_ia():
 
 @app.route('/avaliacao-ia/submeter', methods=['POST'])
 @login_required
+@limitar('avaliacao')
 def submeter_avaliacao():
     texto = request.json.get('texto', '')
     tema = request.json.get('tema', 'Tecnologia e Educação')
     
-    # Motor de avaliação interno (sem API externa)
-    resultado = avaliar_texto_ia(texto, tema)
-    
-    # Salvar no banco
-    db.salvar_avaliacao_ia(
-        session['user_id'], 
-        texto, 
-        resultado['nivel'], 
-        resultado['feedback']
-    )
+    # Motor de avaliação interno (sem API externa), com resultados memoizados
+    resultado = cache_avaliacoes.avaliar(texto, tema, avaliar_texto_ia)
+    
+    # Salvar no banco (em segundo plano quando a fila está habilitada)
+    if app.config['FILA_AVALIACOES']:
+        tarefa_id = fila.enfileirar('salvar_avaliacao_ia', {
+            'usuario_id': session['user_id'],
+            'texto': texto,
+            'nivel': resultado['nivel'],
+            'feedback': resultado['feedback'],
+            'chave': uuid.uuid4().hex
+        }, usuario_id=session['user_id'])
+        resultado = dict(resultado, tarefa_id=tarefa_id)
+    else:
+        db.salvar_avaliacao_ia(
+            session['user_id'], 
+            texto, 
+            resultado['nivel'], 
+            resultado['feedback']
+        )
     
     return jsonify(resultado)
 
+@tarefa('salvar_avaliacao_ia')
+def tarefa_salvar_avaliacao(usuario_id, texto, nivel, feedback, chave=None):
+    """Persistência da avaliação (texto comprimido + índice de similaridade); idempotente pela chave"""
+    avaliacao_id = db.salvar_avaliacao_ia(usuario_id, texto, nivel, feedback, chave_idempotencia=chave)
+    return {'avaliacao_id': avaliacao_id}
+
+# Incrementar a cada mudança nos critérios de avaliar_texto_ia (invalida o cache)
+VERSAO_AVALIADOR = 1
+cache_avaliacoes = CacheAvaliacoes(db, VERSAO_AVALIADOR)
+
 def avaliar_texto_ia(texto, tema):
     """
     Motor de IA interno para avaliação de textos
     Baseado em critérios objetivos e análise de padrões
     """
-    texto_lower = texto.lower()
+    texto_lower = normalizar_texto(texto)
     palavras = texto.split()
     num_palavras = len(palavras)
     num_frases = texto.count('.') + texto.count('!') + texto.count('?')
@@ -337,25 +444,26 @@ def robotica():
 
 @app.route('/robotica/cadastrar', methods=['POST'])
 @login_required
-def cadastrar_projeto():
+@limitar('robotica')
+async def cadastrar_projeto():
     titulo = request.form['titulo']
     descricao = request.form['descricao']
     area = request.form['area']
     nivel = request.form['nivel']
     
-    # Processar imagem
+    # Processar imagem (gravação em disco fora da thread da requisição)
     imagem_path = None
     if 'imagem' in request.files:
         imagem = request.files['imagem']
         if imagem.filename:
             filename = secure_filename(f"{session['user_id']}_{datetime.now().strftime('%Y%m%d%H%M%S')}_{imagem.filename}")
             imagem_path = os.path.join('uploads', filename)
-            imagem.save(os.path.join('static', imagem_path))
+            await adb.run(imagem.save, os.path.join(app.config['UPLOAD_FOLDER'], filename))
     
     # Calcular nota baseada nos critérios (simulação de avaliação)
     nota = calcular_nota_projeto(descricao, area, nivel)
     
-    projeto_id = db.cadastrar_projeto(
+    projeto_id = await adb.cadastrar_projeto(
         session['user_id'], titulo, descricao, area, nivel, nota, imagem_path
     )
     
@@ -388,27 +496,30 @@ def calcular_nota_projeto(descricao, area, nivel):
 @app.route('/robotica/galeria')
 @login_required
 def galeria_robotica():
-    projetos = db.get_projetos_robotica()
-    return render_template('robotica_galeria.html', projetos=projetos)
+    # A consulta só é executada se o fragmento da galeria não estiver em cache
+    return render_template('robotica_galeria.html', projetos=db.get_projetos_robotica)
 
 # ==================== MÓDULO RELATÓRIOS ====================
 
 @app.route('/relatorios')
 @login_required
 def relatorios():
-    user = db.get_user_by_id(session['user_id'])
+    # Síncrona de propósito: get_posicao_ranking domina o tempo e, em workers gthread, a versão
+    # async foi mais lenta (benchmarks/bench_async_views.py). Reavaliar com vários núcleos.
+    user_id = session['user_id']
+    user = db.get_user_by_id(user_id)
     
     # Dados para gráficos
-    dados_matematica = db.get_historico_matematica(session['user_id'])
-    dados_avaliacao = db.get_historico_avaliacoes(session['user_id'])
-    dados_robotica = db.get_historico_robotica(session['user_id'])
+    dados_matematica = db.get_historico_matematica(user_id)
+    dados_avaliacao = db.get_historico_avaliacoes(user_id)
+    dados_robotica = db.get_historico_robotica(user_id)
     
     # Ranking do aluno
-    posicao_geral = db.get_posicao_ranking(session['user_id'])
+    posicao_geral = db.get_posicao_ranking(user_id)
     
     context = {
         'user': user,
-        'pontuacao_total': db.get_pontuacao_total(session['user_id']),
+        'pontuacao_total': db.get_pontuacao_total(user_id),
         'dados_matematica': dados_matematica,
         'dados_avaliacao': dados_avaliacao,
         'dados_robotica': dados_robotica,
@@ -424,27 +535,163 @@ def relatorios():
 def relatorios_professor():
     """Dashboard exclusivo para professores"""
     estatisticas_gerais = db.get_estatisticas_gerais()
-    desempenho_escolas = db.get_desempenho_por_escola()
+    desempenho_escolas = db.get_desempenho_por_escola  # carregado só se o fragmento expirou
+    textos_similares = db.get_avaliacoes_similares()
+    analises = obter_snapshot(db).calcular()
     
     return render_template('relatorios_professor.html', 
                          stats=estatisticas_gerais,
-                         escolas=desempenho_escolas)
+                         escolas=desempenho_escolas,
+                         similares=textos_similares,
+                         analises=analises)
+
+# ==================== ARQUIVOS ESTÁTICOS ====================
+
+@app.route('/static/dist/<path:filename>')
+def static_dist(filename):
+    return assets.servir_asset(filename)
+
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': assets.asset_url}
+
+# ==================== CACHE DE FRAGMENTOS ====================
+
+def cache_fragmento(nome, dominios, caller=None, **params):
+    """Bloco de template em cache: {% call cache_fragmento('nome', dominios=[...]) %}"""
+    if 'versoes_dados' not in g:
+        g.versoes_dados = db.get_versoes_dados()
+    return cache_fragmentos.fragmento(nome, dominios, g.versoes_dados, caller, **params)
+
+@app.context_processor
+def inject_cache_fragmento():
+    return {'cache_fragmento': cache_fragmento}
 
 # ==================== API AUXILIARES ====================
 
 @app.route('/api/pontuacao')
 @login_required
-def api_pontuacao():
+async def api_pontuacao():
+    user_id = session['user_id']
+    
+    # As três somas por módulo são independentes: executar em paralelo
+    matematica, avaliacao_ia, robotica = await adb.gather(
+        adb.get_pontuacao_modulo(user_id, 'matematica'),
+        adb.get_pontuacao_modulo(user_id, 'avaliacao_ia'),
+        adb.get_pontuacao_modulo(user_id, 'robotica')
+    )
+    
     return jsonify({
-        'total': db.get_pontuacao_total(session['user_id']),
-        'matematica': db.get_pontuacao_modulo(session['user_id'], 'matematica'),
-        'avaliacao_ia': db.get_pontuacao_modulo(session['user_id'], 'avaliacao_ia'),
-        'robotica': db.get_pontuacao_modulo(session['user_id'], 'robotica')
+        'total': matematica + avaliacao_ia + robotica,
+        'matematica': matematica,
+        'avaliacao_ia': avaliacao_ia,
+        'robotica': robotica
     })
 
+@app.route('/api/busca')
+@login_required
+def api_busca():
+    """Busca textual em projetos de robótica (tipo=projetos) ou avaliações (tipo=textos)"""
+    consulta = request.args.get('q', '')
+    tipo = request.args.get('tipo', 'projetos')
+    escola = request.args.get('escola') or None
+    nivel = request.args.get('nivel') or None
+    limite = min(max(request.args.get('limite', 20, type=int), 1), 50)
+    
+    if tipo == 'projetos':
+        resultados = db.buscar_projetos(consulta, area=request.args.get('area') or None,
+                                        escola=escola, nivel=nivel, limit=limite)
+    elif tipo == 'textos':
+        # Alunos só encontram as próprias avaliações
+        user = db.get_user_by_id(session['user_id'])
+        usuario_id = None if user and user['tipo'] == 'professor' else session['user_id']
+        resultados = db.buscar_textos(consulta, usuario_id=usuario_id, escola=escola,
+                                      nivel=nivel, limit=limite)
+    else:
+        return jsonify({'erro': 'Tipo de busca inválido'}), 400
+    
+    return jsonify({'consulta': consulta, 'tipo': tipo, 'resultados': resultados})
+
+# ==================== TAREFAS EM SEGUNDO PLANO ====================
+
+@app.route('/tarefas/<int:tarefa_id>')
+@login_required
+def status_tarefa(tarefa_id):
+    """Consulta (polling) do status de uma tarefa enfileirada pelo usuário"""
+    status = fila.get_status(tarefa_id)
+    if not status or status['usuario_id'] != session['user_id']:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    
+    return jsonify({
+        'id': status['id'],
+        'tipo': status['tipo'],
+        'status': status['status'],
+        'tentativas': status['tentativas'],
+        'resultado': status['resultado']
+    })
+
+# ==================== COMANDOS CLI ====================
+
+@app.cli.command('arquivar-matematica')
+@click.option('--dias', type=int, default=None, help='Horizonte em dias (padrão: HORIZONTE_ARQUIVO_DIAS)')
+@click.option('--arquivo', default=None, help='Banco SQLite separado para as linhas arquivadas')
+def arquivar_matematica(dias, arquivo):
+    """Compacta resultados antigos de matemática em resumos diários"""
+    arquivadas = db.arquivar_resultados_matematica(dias, arquivo)
+    click.echo(f'✅ {arquivadas} resultados arquivados.')
+
+@app.cli.command('migrar-textos')
+def migrar_textos():
+    """Move os textos das avaliações para armazenamento comprimido e deduplicado"""
+    relatorio = db.migrar_textos_avaliacoes()
+    anterior = db.get_relatorio_migracao('textos_avaliacao')
+    
+    # O init_db (ao importar o app) normalmente já migrou: mostrar o relatório salvo
+    if not relatorio['avaliacoes_migradas'] and anterior:
+        click.echo(f"Migração executada em {anterior['data_execucao']}:")
+        click.echo(f"  Avaliações migradas: {anterior['avaliacoes_migradas']}")
+        click.echo(f"  Texto original: {anterior['bytes_originais']} bytes -> armazenado: {anterior['bytes_armazenados']} bytes")
+        click.echo(f"  Banco: {anterior['tamanho_banco_antes']} -> {anterior['tamanho_banco_depois']} bytes")
+        click.echo('Situação atual:')
+    else:
+        click.echo(f"Avaliações migradas: {relatorio['avaliacoes_migradas']}")
+    click.echo(f"Textos únicos: {relatorio['textos_unicos']}")
+    click.echo(f"Texto original: {relatorio['bytes_originais']} bytes -> armazenado: {relatorio['bytes_armazenados']} bytes")
+    click.echo(f"Banco: {relatorio['tamanho_banco_antes']} -> {relatorio['tamanho_banco_depois']} bytes")
+
+@app.cli.command('varrer-copias')
+def varrer_copias():
+    """Varre todas as avaliações em busca de textos semelhantes (MinHash/LSH)"""
+    registrados = db.varrer_textos_similares()
+    click.echo(f'✅ {registrados} novos pares de textos semelhantes registrados.')
+
+@app.cli.command('gerar-assets')
+@click.option('--sem-download', is_flag=True, help='Não baixar Chart.js e fontes')
+def gerar_assets(sem_download):
+    """Baixa dependências, gera arquivos com hash e versões .gz/.br em static/dist"""
+    if not sem_download:
+        for caminho in assets.baixar_vendor():
+            click.echo(f'⬇️  {os.path.relpath(caminho, BASE_DIR)}')
+    manifest = assets.construir_assets()
+    click.echo(f'✅ {len(manifest)} arquivos gerados em static/dist')
+
+@app.cli.command('reindexar-busca')
+def reindexar_busca():
+    """Reconstrói os índices de busca textual (FTS5) de projetos e avaliações"""
+    totais = db.reconstruir_indices_busca()
+    click.echo(f"✅ Índices reconstruídos: {totais['projetos']} projetos, {totais['textos']} avaliações.")
+
+@app.cli.command('worker')
+@click.option('--processos', type=int, default=2, help='Número de processos worker')
+def worker(processos):
+    """Executa as tarefas da fila em segundo plano até receber SIGTERM/Ctrl+C"""
+    click.echo(f'👷 Iniciando {processos} workers (fila: {fila.db_path})')
+    iniciar_workers(processos, fila.db_path, modulo_tarefas=__name__)
+
 # Mova o db.init_db() para fora do if, logo abaixo de onde o db é criado
-db = Database()
 db.init_db() # <--- Adicione aqui!
+db.limpar_cache_avaliacoes(VERSAO_AVALIADOR, CACHE_AVALIACOES_MAX_PERSISTENTE)
+fila.init_db()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
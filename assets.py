@@ -0,0 +1,198 @@
+"""
+Pipeline de arquivos estáticos
+Baixa as dependências externas (Chart.js e fonte Inter) para static/vendor,
+gera cópias com hash do conteúdo no nome em static/dist, cria versões
+pré-comprimidas (.gz e .br) e serve essas versões com cache imutável.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import urllib.request
+
+from flask import request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+
+# Diretórios de static/ que passam pelo pipeline
+ORIGENS = ['css', 'js', 'vendor']
+EXTENSOES = {'.css', '.js', '.woff2', '.svg'}
+EXTENSOES_COMPRIMIVEIS = {'.css', '.js', '.svg'}
+
+CHART_JS_URL = 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js'
+FONTE_URL = 'https://cdn.jsdelivr.net/npm/@fontsource/inter@5.0.16/files/inter-latin-{peso}-normal.woff2'
+FONTE_PESOS = [300, 400, 600, 700]
+
+# Endereço externo usado enquanto o build não foi executado
+VENDOR = {
+    'vendor/chart.umd.js': CHART_JS_URL,
+    'vendor/fonts/inter.css': 'https://fonts.googleapis.com/css2?family=Inter:wght@300;400;600;700&display=swap',
+}
+
+CACHE_IMUTAVEL = 365 * 24 * 60 * 60
+
+_manifest = None
+
+
+# ==================== BUILD ====================
+
+def _baixar(url, destino):
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    with urllib.request.urlopen(url, timeout=30) as resposta, open(destino, 'wb') as arquivo:
+        shutil.copyfileobj(resposta, arquivo)
+
+
+def baixar_vendor(forcar=False):
+    """Baixa Chart.js e a fonte Inter para static/vendor (apenas o que falta)"""
+    baixados = []
+    destino = os.path.join(STATIC_DIR, 'vendor', 'chart.umd.js')
+    if forcar or not os.path.exists(destino):
+        _baixar(CHART_JS_URL, destino)
+        baixados.append(destino)
+
+    fontes_dir = os.path.join(STATIC_DIR, 'vendor', 'fonts')
+    regras = []
+    for peso in FONTE_PESOS:
+        nome = f'inter-latin-{peso}-normal.woff2'
+        destino = os.path.join(fontes_dir, nome)
+        if forcar or not os.path.exists(destino):
+            _baixar(FONTE_URL.format(peso=peso), destino)
+            baixados.append(destino)
+        regras.append(
+            "@font-face {\n"
+            "    font-family: 'Inter';\n"
+            "    font-style: normal;\n"
+            f"    font-weight: {peso};\n"
+            "    font-display: swap;\n"
+            f"    src: url('{nome}') format('woff2');\n"
+            "}\n"
+        )
+    with open(os.path.join(fontes_dir, 'inter.css'), 'w', encoding='utf-8') as arquivo:
+        arquivo.write('\n'.join(regras))
+    return baixados
+
+
+def _reescrever_urls_css(conteudo, origem_rel, manifest):
+    """Aponta os url(...) do CSS para as versões com hash"""
+    pasta = os.path.dirname(origem_rel)
+
+    def substituir(match):
+        alvo = match.group(2)
+        if re.match(r'^(data:|https?:|/)', alvo):
+            return match.group(0)
+        caminho = os.path.normpath(os.path.join(pasta, alvo)).replace(os.sep, '/')
+        if caminho not in manifest:
+            return match.group(0)
+        # static/dist espelha a estrutura de static/, então a pasta relativa é a mesma
+        novo = os.path.relpath(manifest[caminho], pasta).replace(os.sep, '/')
+        return f"url({match.group(1)}{novo}{match.group(1)})"
+
+    return re.sub(r"""url\((['"]?)([^'")]+)\1\)""", substituir, conteudo)
+
+
+def _comprimir(caminho, dados):
+    with open(caminho + '.gz', 'wb') as arquivo:
+        arquivo.write(gzip.compress(dados, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(caminho + '.br', 'wb') as arquivo:
+            arquivo.write(brotli.compress(dados, quality=11))
+
+
+def construir_assets():
+    """Gera static/dist com nomes por hash, versões .gz/.br e o manifest.json"""
+    if os.path.isdir(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    arquivos = []
+    for origem in ORIGENS:
+        for raiz, _, nomes in os.walk(os.path.join(STATIC_DIR, origem)):
+            for nome in sorted(nomes):
+                if os.path.splitext(nome)[1] in EXTENSOES:
+                    caminho = os.path.join(raiz, nome)
+                    arquivos.append(os.path.relpath(caminho, STATIC_DIR).replace(os.sep, '/'))
+
+    # CSS por último: suas referências (fontes) precisam já ter hash
+    arquivos.sort(key=lambda rel: rel.endswith('.css'))
+
+    manifest = {}
+    for rel in arquivos:
+        with open(os.path.join(STATIC_DIR, rel), 'rb') as arquivo:
+            dados = arquivo.read()
+        base, ext = os.path.splitext(rel)
+        if ext == '.css':
+            dados = _reescrever_urls_css(dados.decode('utf-8'), rel, manifest).encode('utf-8')
+        digest = hashlib.sha256(dados).hexdigest()[:10]
+        destino_rel = f'{base}.{digest}{ext}'
+        manifest[rel] = destino_rel
+
+        destino = os.path.join(DIST_DIR, destino_rel)
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+        with open(destino, 'wb') as arquivo:
+            arquivo.write(dados)
+        if ext in EXTENSOES_COMPRIMIVEIS:
+            _comprimir(destino, dados)
+
+    with open(MANIFEST, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifest, arquivo, indent=2, sort_keys=True)
+
+    carregar_manifest(recarregar=True)
+    return manifest
+
+
+# ==================== INTEGRAÇÃO FLASK ====================
+
+def carregar_manifest(recarregar=False):
+    global _manifest
+    if _manifest is None or recarregar:
+        try:
+            with open(MANIFEST, encoding='utf-8') as arquivo:
+                _manifest = json.load(arquivo)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(caminho):
+    """URL do arquivo estático: versão com hash, original ou CDN (antes do build)"""
+    manifest = carregar_manifest()
+    if caminho in manifest:
+        return url_for('static_dist', filename=manifest[caminho])
+    if caminho in VENDOR and not os.path.exists(os.path.join(STATIC_DIR, caminho)):
+        return VENDOR[caminho]
+    return url_for('static', filename=caminho)
+
+
+def servir_asset(filename):
+    """Serve de static/dist, preferindo a versão pré-comprimida aceita pelo navegador"""
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    resposta = None
+
+    for codificacao, extensao in (('br', '.br'), ('gzip', '.gz')):
+        caminho = safe_join(DIST_DIR, filename + extensao)
+        if request.accept_encodings[codificacao] and caminho and os.path.isfile(caminho):
+            resposta = send_from_directory(DIST_DIR, filename + extensao, mimetype=mimetype,
+                                           max_age=CACHE_IMUTAVEL)
+            resposta.headers['Content-Encoding'] = codificacao
+            break
+
+    if resposta is None:
+        resposta = send_from_directory(DIST_DIR, filename, mimetype=mimetype, max_age=CACHE_IMUTAVEL)
+
+    resposta.headers['Vary'] = 'Accept-Encoding'
+    resposta.cache_control.public = True
+    resposta.cache_control.immutable = True
+    return resposta
@@ -0,0 +1,45 @@
+"""
+Acesso assíncrono ao banco de dados
+Executa as operações síncronas de Database em um pool de threads limitado,
+permitindo que as rotas async disparem consultas independentes em paralelo
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Limite de threads dedicadas ao banco (por processo)
+DB_MAX_WORKERS = int(os.environ.get('DB_MAX_WORKERS', 8))
+
+
+class AsyncDatabase:
+    def __init__(self, db, max_workers=None):
+        self.db = db
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or DB_MAX_WORKERS,
+            thread_name_prefix='ceitec-db'
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """Executa uma função bloqueante no pool de threads do banco"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def gather(self, *coros):
+        """Aguarda várias consultas independentes simultaneamente"""
+        return await asyncio.gather(*coros)
+
+    def __getattr__(self, name):
+        # Expõe cada método de Database como corrotina: await adb.get_ranking_geral()
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+        return wrapper
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
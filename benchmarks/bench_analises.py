@@ -0,0 +1,78 @@
+"""
+Benchmark: motor de análises NumPy do dashboard do professor
+Uso: python benchmarks/bench_analises.py [--alunos 5000] [--resultados 1000000]
+
+Mede a carga inicial do snapshot, o cálculo das análises, a atualização
+incremental após novas linhas e a resposta com o resultado em cache (inclusive
+enquanto a atualização roda em segundo plano).
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Database
+from analises import SnapshotAnalitico
+
+
+def popular_banco(db, num_alunos, num_resultados):
+    db.init_db()
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO usuarios (nome, escola, serie, senha_hash, tipo) VALUES (?, ?, ?, 'x', 'aluno')",
+        [(f'aluno{i}', f'Escola {i % 40}', f'{6 + i % 4}º ano') for i in range(num_alunos)]
+    )
+    cursor.executemany(
+        "INSERT INTO resultados_matematica (usuario_id, nivel, pontuacao, data_jogo) VALUES (?, 'facil', ?, datetime('now', ?))",
+        ((random.randint(1, num_alunos), random.choice([10, 20, 30]), f'-{random.randint(0, 365)} days')
+         for _ in range(num_resultados))
+    )
+    conn.commit()
+    conn.close()
+
+
+def cronometrar(func):
+    inicio = time.perf_counter()
+    func()
+    return (time.perf_counter() - inicio) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--alunos', type=int, default=5000)
+    parser.add_argument('--resultados', type=int, default=1000000)
+    parser.add_argument('--novos', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        print(f'Populando banco ({args.alunos} alunos, {args.resultados} resultados)...')
+        popular_banco(db, args.alunos, args.resultados)
+
+        snapshot = SnapshotAnalitico(db)
+        print(f'\nCarga inicial do snapshot:   {cronometrar(lambda: snapshot.atualizar(forcar=True)):8.1f} ms')
+        print(f'Cálculo das análises:        {cronometrar(snapshot.recalcular):8.1f} ms')
+        print(f'Resultado em cache:          {cronometrar(snapshot.calcular):8.3f} ms')
+
+        conn = db.get_connection()
+        conn.executemany(
+            "INSERT INTO resultados_matematica (usuario_id, nivel, pontuacao) VALUES (?, 'medio', 20)",
+            [(random.randint(1, args.alunos),) for _ in range(args.novos)]
+        )
+        conn.commit()
+        conn.close()
+
+        snapshot.atualizado_em = 0  # resultado velho: calcular() dispara a thread de fundo
+        print(f'Resposta durante atualização:{cronometrar(snapshot.calcular):8.3f} ms')
+        print(f'Atualização em segundo plano:{cronometrar(lambda: snapshot.aquecer().join()):8.1f} ms '
+              f'(+{args.novos} linhas e recálculo)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark: caminho síncrono x caminho async (async_db) das rotas de leitura
+Uso: python benchmarks/bench_async_views.py [--alunos 500] [--resultados 200000]
+
+Reproduz as consultas feitas por /api/pontuacao e /relatorios em um banco
+temporário e compara:
+  - latência de uma requisição (consultas em sequência x em paralelo)
+  - vazão com várias requisições simultâneas no mesmo processo, como em um
+    worker gthread: um pool de GUNICORN_THREADS threads atende as requisições e
+    cada rota async roda em seu próprio event loop (como o Flask faz via asgiref)
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Database
+from async_db import AsyncDatabase
+
+
+def popular_banco(db, num_alunos, num_resultados):
+    db.init_db()
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    escolas = [f'Escola {i}' for i in range(10)]
+    cursor.executemany(
+        "INSERT INTO usuarios (nome, escola, serie, senha_hash, tipo) VALUES (?, ?, ?, 'x', 'aluno')",
+        [(f'aluno{i}', random.choice(escolas), f'{random.randint(6, 9)}º ano') for i in range(num_alunos)]
+    )
+    cursor.executemany(
+        "INSERT INTO resultados_matematica (usuario_id, nivel, pontuacao) VALUES (?, ?, ?)",
+        [(random.randint(1, num_alunos), random.choice(['facil', 'medio', 'dificil']), random.choice([10, 20, 30]))
+         for _ in range(num_resultados)]
+    )
+    texto_hash = db._salvar_texto(cursor, 'texto')
+    cursor.executemany(
+        "INSERT INTO avaliacoes_ia (usuario_id, texto_hash, nivel_classificacao, feedback, pontuacao) VALUES (?, ?, 'Proficiente', 'ok', 75)",
+        [(random.randint(1, num_alunos), texto_hash) for _ in range(num_resultados // 10)]
+    )
+    conn.commit()
+    conn.close()
+
+
+# ---------- caminho síncrono (como /relatorios faz) ----------
+
+def pontuacao_sync(db, user_id):
+    return {
+        'total': db.get_pontuacao_total(user_id),
+        'matematica': db.get_pontuacao_modulo(user_id, 'matematica'),
+        'avaliacao_ia': db.get_pontuacao_modulo(user_id, 'avaliacao_ia'),
+        'robotica': db.get_pontuacao_modulo(user_id, 'robotica')
+    }
+
+
+def relatorios_sync(db, user_id):
+    return (
+        db.get_user_by_id(user_id),
+        db.get_historico_matematica(user_id),
+        db.get_historico_avaliacoes(user_id),
+        db.get_historico_robotica(user_id),
+        db.get_posicao_ranking(user_id),
+        db.get_pontuacao_total(user_id),
+        db.get_total_alunos()
+    )
+
+
+# ---------- caminho async (como /api/pontuacao faz; /relatorios só para comparação) ----------
+
+async def pontuacao_async(adb, user_id):
+    mat, ia, rob = await adb.gather(
+        adb.get_pontuacao_modulo(user_id, 'matematica'),
+        adb.get_pontuacao_modulo(user_id, 'avaliacao_ia'),
+        adb.get_pontuacao_modulo(user_id, 'robotica')
+    )
+    return {'total': mat + ia + rob, 'matematica': mat, 'avaliacao_ia': ia, 'robotica': rob}
+
+
+async def relatorios_async(adb, user_id):
+    (user, mat_hist, ia_hist, rob_hist, posicao, mat, ia, rob, alunos) = await adb.gather(
+        adb.get_user_by_id(user_id),
+        adb.get_historico_matematica(user_id),
+        adb.get_historico_avaliacoes(user_id),
+        adb.get_historico_robotica(user_id),
+        adb.get_posicao_ranking(user_id),
+        adb.get_pontuacao_modulo(user_id, 'matematica'),
+        adb.get_pontuacao_modulo(user_id, 'avaliacao_ia'),
+        adb.get_pontuacao_modulo(user_id, 'robotica'),
+        adb.get_total_alunos()
+    )
+    return user, mat_hist, ia_hist, rob_hist, posicao, mat + ia + rob, alunos
+
+
+async def relatorios_parcial(adb, user_id):
+    # Só os ramos caros em paralelo; as consultas rápidas seguem na thread da requisição
+    posicao, mat, ia, rob = await adb.gather(
+        adb.get_posicao_ranking(user_id),
+        adb.get_pontuacao_modulo(user_id, 'matematica'),
+        adb.get_pontuacao_modulo(user_id, 'avaliacao_ia'),
+        adb.get_pontuacao_modulo(user_id, 'robotica')
+    )
+    db = adb.db
+    return (db.get_user_by_id(user_id), db.get_historico_matematica(user_id),
+            db.get_historico_avaliacoes(user_id), db.get_historico_robotica(user_id),
+            posicao, mat + ia + rob, db.get_total_alunos())
+
+
+def medir_latencia(func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--alunos', type=int, default=500)
+    parser.add_argument('--resultados', type=int, default=200000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--concorrencia', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('GUNICORN_THREADS', 4)),
+                        help='threads por worker gthread (GUNICORN_THREADS)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        print(f'Populando banco ({args.alunos} alunos, {args.resultados} resultados)...')
+        popular_banco(db, args.alunos, args.resultados)
+        adb = AsyncDatabase(db, max_workers=args.workers)
+
+        ids = [random.randint(1, args.alunos) for _ in range(args.concorrencia)]
+
+        # Em paralelo, a latência tende à da consulta mais lenta; em sequência, à soma de todas.
+        # O ganho real depende de haver núcleos livres (com 1 CPU as threads só somam overhead).
+        uid = ids[0]
+        consultas = {
+            'get_user_by_id': lambda: db.get_user_by_id(uid),
+            'get_historico_matematica': lambda: db.get_historico_matematica(uid),
+            'get_historico_avaliacoes': lambda: db.get_historico_avaliacoes(uid),
+            'get_historico_robotica': lambda: db.get_historico_robotica(uid),
+            'get_posicao_ranking': lambda: db.get_posicao_ranking(uid),
+            'get_pontuacao_modulo(mat)': lambda: db.get_pontuacao_modulo(uid, 'matematica'),
+            'get_pontuacao_modulo(ia)': lambda: db.get_pontuacao_modulo(uid, 'avaliacao_ia'),
+            'get_pontuacao_modulo(rob)': lambda: db.get_pontuacao_modulo(uid, 'robotica'),
+            'get_total_alunos': lambda: db.get_total_alunos(),
+        }
+        tempos = {nome: medir_latencia(consulta, args.repeticoes) for nome, consulta in consultas.items()}
+        print(f'\nConsultas de /relatorios (ms, {os.cpu_count()} CPU)')
+        for nome, tempo in tempos.items():
+            print(f'{nome:<28}{tempo:>8.2f}')
+        print(f"{'soma (sequencial)':<28}{sum(tempos.values()):>8.2f}")
+        print(f"{'maior (limite em paralelo)':<28}{max(tempos.values()):>8.2f}")
+
+        rotas = [
+            ('/api/pontuacao', pontuacao_sync, pontuacao_async),
+            ('/relatorios', relatorios_sync, relatorios_async),
+            ('/relatorios (parcial)', relatorios_sync, relatorios_parcial),
+        ]
+
+        print('\nLatência mediana por requisição (ms)')
+        print(f"{'rota':<24}{'sync':>10}{'async':>10}{'ganho':>10}")
+        for nome, f_sync, f_async in rotas:
+            t_sync = medir_latencia(lambda: f_sync(db, ids[0]), args.repeticoes)
+            t_async = medir_latencia(lambda: asyncio.run(f_async(adb, ids[0])), args.repeticoes)
+            print(f'{nome:<24}{t_sync:>10.2f}{t_async:>10.2f}{t_sync / t_async:>9.2f}x')
+
+        print(f'\nVazão com {args.concorrencia} requisições em {args.threads} threads (req/s)')
+        print(f"{'rota':<24}{'sync':>10}{'async':>10}{'ganho':>10}")
+        requisicoes = ThreadPoolExecutor(max_workers=args.threads)
+        for nome, f_sync, f_async in rotas:
+            # As duas versões atendidas pelo mesmo pool; a async com um event loop por requisição
+            inicio = time.perf_counter()
+            list(requisicoes.map(lambda user_id: f_sync(db, user_id), ids))
+            rps_sync = len(ids) / (time.perf_counter() - inicio)
+
+            inicio = time.perf_counter()
+            list(requisicoes.map(lambda user_id: asyncio.run(f_async(adb, user_id)), ids))
+            rps_async = len(ids) / (time.perf_counter() - inicio)
+            print(f'{nome:<24}{rps_sync:>10.1f}{rps_async:>10.1f}{rps_async / rps_sync:>9.2f}x')
+
+        requisicoes.shutdown()
+        adb.shutdown()
+
+
+if __name__ == '__main__':
+    main()
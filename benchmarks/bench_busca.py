@@ -0,0 +1,114 @@
+"""
+Benchmark: busca textual FTS5 x LIKE '%...%'
+Uso: python benchmarks/bench_busca.py [--projetos 200000] [--textos 100000]
+
+Popula um banco temporário com projetos e avaliações sintéticos, reconstrói
+os índices de busca e compara a latência das consultas de Database.buscar_*
+com a varredura LIKE equivalente.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Database, comprimir_texto
+
+VOCABULARIO = (
+    'robô sensor motor arduino scratch programação código circuito automação engenharia '
+    'inteligência artificial dados algoritmo modelo predição aprendizado escola aluno '
+    'professor educação tecnologia internet digital sistema computador software hardware '
+    'projeto protótipo bateria servo led ultrassônico garra braço carrinho seguidor linha'
+).split() + [f'palavra{i}' for i in range(5000)]
+
+CONSULTAS = ['robo', 'inteligencia artificial', 'sensor ultrassonico', 'palavra4321', 'garra servo bateria']
+
+
+def texto_aleatorio(palavras):
+    return ' '.join(random.choices(VOCABULARIO, k=palavras))
+
+
+def popular(db, num_projetos, num_textos):
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    escolas = [f'Escola {i}' for i in range(50)]
+    cursor.executemany('''
+        INSERT INTO usuarios (nome, escola, serie, senha_hash, tipo) VALUES (?, ?, '9', '', 'aluno')
+    ''', [(f'aluno{i}', random.choice(escolas)) for i in range(2000)])
+
+    cursor.executemany('''
+        INSERT INTO projetos_robotica (usuario_id, titulo, descricao, area, nivel, nota)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [(random.randint(1, 2000), texto_aleatorio(4), texto_aleatorio(60),
+           random.choice(['Arduino', 'Scratch', 'IA', 'Maker']),
+           random.choice(['iniciante', 'intermediario', 'avancado']), random.randint(0, 100))
+          for _ in range(num_projetos)])
+
+    for _ in range(num_textos):
+        texto = texto_aleatorio(150)
+        texto_hash = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+        compressao, conteudo = comprimir_texto(texto)
+        cursor.execute('''
+            INSERT OR IGNORE INTO textos_avaliacao (hash, compressao, conteudo, tamanho) VALUES (?, ?, ?, ?)
+        ''', (texto_hash, compressao, conteudo, len(texto)))
+        cursor.execute('''
+            INSERT INTO avaliacoes_ia (usuario_id, texto_hash, nivel_classificacao, feedback, pontuacao)
+            VALUES (?, ?, ?, '', 50)
+        ''', (random.randint(1, 2000), texto_hash,
+              random.choice(['Iniciante', 'Intermediário', 'Proficiente', 'Avançado'])))
+    conn.commit()
+    conn.close()
+
+
+def medir(funcao, repeticoes=20):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--projetos', type=int, default=200000)
+    parser.add_argument('--textos', type=int, default=100000)
+    args = parser.parse_args()
+    random.seed(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        db.init_db()
+
+        inicio = time.perf_counter()
+        popular(db, args.projetos, args.textos)
+        print(f'Carga ({args.projetos} projetos, {args.textos} avaliações, gatilhos ativos): '
+              f'{time.perf_counter() - inicio:.1f}s')
+
+        inicio = time.perf_counter()
+        db.reconstruir_indices_busca()
+        print(f'reindexar-busca: {time.perf_counter() - inicio:.1f}s')
+
+        conn = db.get_connection()
+        print(f'\n{"consulta":<26}{"FTS projetos":>14}{"+ filtros":>12}{"FTS textos":>12}{"LIKE projetos":>15}')
+        for consulta in CONSULTAS:
+            t_projetos = medir(lambda: db.buscar_projetos(consulta))
+            t_filtros = medir(lambda: db.buscar_projetos(consulta, area='Arduino', nivel='avancado'))
+            t_textos = medir(lambda: db.buscar_textos(consulta))
+            termo = f'%{consulta.split()[0]}%'
+            t_like = medir(lambda: conn.execute('''
+                SELECT id FROM projetos_robotica WHERE titulo LIKE ? OR descricao LIKE ?
+                ORDER BY nota DESC LIMIT 20
+            ''', (termo, termo)).fetchall(), repeticoes=3)
+            print(f'{consulta:<26}{t_projetos:>12.2f}ms{t_filtros:>10.2f}ms{t_textos:>10.2f}ms{t_like:>13.2f}ms')
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
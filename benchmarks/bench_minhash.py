@@ -0,0 +1,121 @@
+"""
+Benchmark: detecção de textos semelhantes (MinHash/LSH) x Jaccard exato
+Uso: python benchmarks/bench_minhash.py [--textos 1000] [--copias 300]
+
+Gera um corpus sintético com cópias parcialmente modificadas, indexa tudo
+em um banco temporário e compara os pares encontrados pelo índice LSH com os
+pares reais (Jaccard exato >= limiar, comparando todos contra todos). Mede
+também a latência de uma submissão nova, com o cálculo da assinatura.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import similaridade
+from models import Database
+
+
+def gerar_corpus(num_textos, num_copias, palavras_por_texto, taxa_mutacao_max):
+    vocabulario = [f'palavra{i}' for i in range(3000)]
+    textos = [' '.join(random.choices(vocabulario, k=palavras_por_texto)) for _ in range(num_textos)]
+    for _ in range(num_copias):
+        palavras = random.choice(textos).split()
+        taxa = random.uniform(0, taxa_mutacao_max)
+        for i in range(len(palavras)):
+            if random.random() < taxa:
+                palavras[i] = random.choice(vocabulario)
+        textos.append(' '.join(palavras))
+    return list(dict.fromkeys(textos))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--textos', type=int, default=1000)
+    parser.add_argument('--copias', type=int, default=300)
+    parser.add_argument('--palavras', type=int, default=150)
+    parser.add_argument('--mutacao', type=float, default=0.3)
+    args = parser.parse_args()
+
+    limiar = similaridade.LIMIAR_SIMILARIDADE
+    textos = gerar_corpus(args.textos, args.copias, args.palavras, args.mutacao)
+    hashes = [hashlib.sha256(t.encode('utf-8')).hexdigest() for t in textos]
+    print(f'Corpus: {len(textos)} textos, limiar de similaridade {limiar}')
+
+    # Verdade: Jaccard exato entre todos os pares
+    inicio = time.perf_counter()
+    conjuntos = [similaridade.shingles(t) for t in textos]
+    reais = set()
+    for i in range(len(textos)):
+        for j in range(i + 1, len(textos)):
+            if similaridade.jaccard(conjuntos[i], conjuntos[j]) >= limiar:
+                reais.add((min(hashes[i], hashes[j]), max(hashes[i], hashes[j])))
+    t_exato = time.perf_counter() - inicio
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        db.init_db()
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        inicio = time.perf_counter()
+        assinaturas = [db._indexar_similaridade(cursor, h, t) for h, t in zip(hashes, textos)]
+        conn.commit()
+        t_indexacao = time.perf_counter() - inicio
+
+        # Consulta ao índice para cada texto (assinatura já calculada)
+        encontrados = set()
+        tempos_consulta = []
+        for h, assinatura in zip(hashes, assinaturas):
+            inicio = time.perf_counter()
+            candidatos = db._candidatos_similares(cursor, assinatura)
+            tempos_consulta.append((time.perf_counter() - inicio) * 1000)
+            for outro, _ in candidatos:
+                if outro != h:
+                    encontrados.add((min(h, outro), max(h, outro)))
+
+        tempos_assinatura = []
+        for t in textos[:200]:
+            inicio = time.perf_counter()
+            similaridade.assinatura_minhash(t)
+            tempos_assinatura.append((time.perf_counter() - inicio) * 1000)
+        conn.close()
+
+        # Submissões novas: assinatura + candidatos, e a gravação completa (salvar_avaliacao_ia)
+        novos = gerar_corpus(100, 100, args.palavras, args.mutacao)[:100]
+        tempos_candidatos = []
+        for t in novos:
+            inicio = time.perf_counter()
+            db.buscar_textos_similares(t)
+            tempos_candidatos.append((time.perf_counter() - inicio) * 1000)
+        tempos_submissao = []
+        for usuario_id, t in enumerate(novos, start=1):
+            inicio = time.perf_counter()
+            db.salvar_avaliacao_ia(usuario_id, t, 'Intermediário', 'benchmark')
+            tempos_submissao.append((time.perf_counter() - inicio) * 1000)
+
+    verdadeiros = len(encontrados & reais)
+    precisao = verdadeiros / len(encontrados) if encontrados else 1.0
+    revocacao = verdadeiros / len(reais) if reais else 1.0
+
+    print(f'\nPares reais (Jaccard exato): {len(reais)}  em {t_exato:.2f}s')
+    print(f'Pares encontrados (LSH):     {len(encontrados)}')
+    print(f'Precisão: {precisao:.3f}   Revocação: {revocacao:.3f}')
+    print(f'\nIndexação: {t_indexacao * 1000 / len(textos):.2f} ms/texto')
+    print(f'Assinatura MinHash: mediana {statistics.median(tempos_assinatura):.2f} ms')
+    print(f'Consulta ao índice: mediana {statistics.median(tempos_consulta):.3f} ms, '
+          f'p95 {sorted(tempos_consulta)[int(len(tempos_consulta) * 0.95)]:.3f} ms')
+    print(f'Submissão nova, assinatura + candidatos: mediana {statistics.median(tempos_candidatos):.2f} ms')
+    print(f'Submissão nova, salvar_avaliacao_ia completa: mediana {statistics.median(tempos_submissao):.2f} ms, '
+          f'p95 {sorted(tempos_submissao)[int(len(tempos_submissao) * 0.95)]:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
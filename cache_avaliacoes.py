@@ -0,0 +1,75 @@
+"""
+Memoização das avaliações de texto
+Reaproveita o resultado de avaliar_texto_ia quando o mesmo texto (ignorando
+maiúsculas e espaços) é enviado de novo. Primeiro nível: LRU em memória;
+segundo nível (opcional): tabela cache_avaliacoes no SQLite, que sobrevive a
+reinícios. A versão do avaliador faz parte da chave, então mudar os critérios
+invalida tudo automaticamente.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+CACHE_AVALIACOES_MAX = int(os.environ.get('CACHE_AVALIACOES_MAX', 1024))
+# Limite da tabela cache_avaliacoes: acima dele as entradas mais antigas são removidas
+CACHE_AVALIACOES_MAX_PERSISTENTE = int(os.environ.get('CACHE_AVALIACOES_MAX_PERSISTENTE', 20000))
+CACHE_AVALIACOES_PERSISTENTE = os.environ.get('CACHE_AVALIACOES_PERSISTENTE', '1') == '1'
+
+
+def normalizar_texto(texto):
+    """Minúsculas e espaços colapsados: forma usada pelo avaliador e pela chave"""
+    return ' '.join(texto.lower().split())
+
+
+class CacheAvaliacoes:
+    def __init__(self, db, versao, max_itens=None, persistente=None, max_persistente=None):
+        self.db = db
+        self.versao = versao
+        self.max_itens = max_itens or CACHE_AVALIACOES_MAX
+        self.max_persistente = max_persistente or CACHE_AVALIACOES_MAX_PERSISTENTE
+        self.persistente = CACHE_AVALIACOES_PERSISTENTE if persistente is None else persistente
+        self.itens = OrderedDict()
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def chave(self, texto, tema):
+        conteudo = f'{self.versao}\x00{tema}\x00{normalizar_texto(texto)}'
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def _obter_memoria(self, chave):
+        with self.lock:
+            resultado = self.itens.get(chave)
+            if resultado is not None:
+                self.itens.move_to_end(chave)
+            return resultado
+
+    def _guardar_memoria(self, chave, resultado):
+        with self.lock:
+            self.itens[chave] = resultado
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+
+    def avaliar(self, texto, tema, avaliador):
+        """Retorna o resultado em cache ou chama avaliador(texto, tema) e guarda"""
+        chave = self.chave(texto, tema)
+
+        resultado = self._obter_memoria(chave)
+        if resultado is None and self.persistente:
+            resultado = self.db.get_avaliacao_cache(chave, self.versao)
+            if resultado is not None:
+                self._guardar_memoria(chave, resultado)
+
+        if resultado is not None:
+            self.acertos += 1
+            return resultado
+
+        self.falhas += 1
+        resultado = avaliador(texto, tema)
+        self._guardar_memoria(chave, resultado)
+        if self.persistente:
+            self.db.salvar_avaliacao_cache(chave, self.versao, resultado, self.max_persistente)
+        return resultado
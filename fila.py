@@ -0,0 +1,240 @@
+"""
+Fila de tarefas em segundo plano (SQLite)
+As rotas enfileiram tarefas com enfileirar(); os workers (flask --app app worker)
+reservam, executam e registram o resultado. Tarefas que falham voltam para a
+fila com espera exponencial; tarefas de um worker que morreu reaparecem após o
+tempo de visibilidade. A entrega é "pelo menos uma vez": tarefas devem ser
+idempotentes ou tolerar repetição. Tarefas concluídas ou que falharam são
+apagadas pelos workers depois de FILA_RETENCAO_DIAS.
+"""
+
+import importlib
+import json
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sqlite3
+import time
+import traceback
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILA_DATABASE = os.environ.get('FILA_DATABASE', os.path.join(BASE_DIR, 'fila.db'))
+
+MAX_TENTATIVAS = 5
+VISIBILIDADE = 300          # segundos que uma tarefa fica reservada para um worker
+ESPERA_BASE = 2             # primeira espera após falha (segundos), dobra a cada tentativa
+ESPERA_MAXIMA = 600
+INTERVALO_CONSULTA = 0.5    # pausa do worker quando a fila está vazia
+RETENCAO_DIAS = float(os.environ.get('FILA_RETENCAO_DIAS', 7))  # tarefas finalizadas ficam para consulta
+INTERVALO_LIMPEZA = 3600    # frequência da limpeza feita por cada worker (segundos)
+
+# Funções executadas pelos workers, registradas com @tarefa('nome')
+TAREFAS = {}
+
+
+def tarefa(nome):
+    def decorator(f):
+        TAREFAS[nome] = f
+        return f
+    return decorator
+
+
+class Fila:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or FILA_DATABASE
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_db(self):
+        conn = self.get_connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tarefas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                usuario_id INTEGER,
+                status TEXT CHECK(status IN ('pendente', 'executando', 'concluida', 'falhou')) NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                max_tentativas INTEGER NOT NULL,
+                disponivel_em REAL NOT NULL,
+                reservada_ate REAL,
+                worker TEXT,
+                resultado TEXT,
+                erro TEXT,
+                criada_em REAL NOT NULL,
+                atualizada_em REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas (status, disponivel_em)')
+        conn.close()
+
+    def enfileirar(self, tipo, payload, usuario_id=None, max_tentativas=MAX_TENTATIVAS, atraso=0):
+        """Adiciona uma tarefa à fila e retorna seu id"""
+        agora = time.time()
+        conn = self.get_connection()
+        cursor = conn.execute('''
+            INSERT INTO tarefas (tipo, payload, usuario_id, status, max_tentativas,
+                                 disponivel_em, criada_em, atualizada_em)
+            VALUES (?, ?, ?, 'pendente', ?, ?, ?, ?)
+        ''', (tipo, json.dumps(payload, ensure_ascii=False), usuario_id, max_tentativas,
+              agora + atraso, agora, agora))
+        tarefa_id = cursor.lastrowid
+        conn.close()
+        return tarefa_id
+
+    def reservar(self, worker):
+        """Reserva a próxima tarefa disponível (ou com reserva expirada) para o worker"""
+        agora = time.time()
+        conn = self.get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Reserva expirada sem tentativas restantes: o worker morreu em todas (OOM, SIGKILL...)
+            conn.execute('''
+                UPDATE tarefas
+                SET status = 'falhou', reservada_ate = NULL, atualizada_em = ?,
+                    erro = 'Reserva expirada: o worker não concluiu a tarefa'
+                WHERE status = 'executando' AND reservada_ate < ? AND tentativas >= max_tentativas
+            ''', (agora, agora))
+            row = conn.execute('''
+                SELECT * FROM tarefas
+                WHERE (status = 'pendente' AND disponivel_em <= ?)
+                   OR (status = 'executando' AND reservada_ate < ? AND tentativas < max_tentativas)
+                ORDER BY disponivel_em, id
+                LIMIT 1
+            ''', (agora, agora)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute('''
+                UPDATE tarefas
+                SET status = 'executando', tentativas = tentativas + 1,
+                    reservada_ate = ?, worker = ?, atualizada_em = ?
+                WHERE id = ?
+            ''', (agora + VISIBILIDADE, worker, agora, row['id']))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        tarefa = dict(row)
+        tarefa['tentativas'] += 1
+        tarefa['payload'] = json.loads(tarefa['payload'])
+        return tarefa
+
+    def concluir(self, tarefa_id, worker, resultado=None):
+        conn = self.get_connection()
+        conn.execute('''
+            UPDATE tarefas
+            SET status = 'concluida', resultado = ?, erro = NULL, reservada_ate = NULL, atualizada_em = ?
+            WHERE id = ? AND worker = ?
+        ''', (json.dumps(resultado, ensure_ascii=False), time.time(), tarefa_id, worker))
+        conn.close()
+
+    def falhar(self, tarefa, worker, erro):
+        """Devolve a tarefa à fila com espera exponencial, ou marca como falha definitiva"""
+        agora = time.time()
+        if tarefa['tentativas'] >= tarefa['max_tentativas']:
+            status, disponivel_em = 'falhou', agora
+        else:
+            espera = min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** (tarefa['tentativas'] - 1))
+            status, disponivel_em = 'pendente', agora + espera * random.uniform(0.8, 1.2)
+
+        conn = self.get_connection()
+        conn.execute('''
+            UPDATE tarefas
+            SET status = ?, erro = ?, disponivel_em = ?, reservada_ate = NULL, atualizada_em = ?
+            WHERE id = ? AND worker = ?
+        ''', (status, erro, disponivel_em, agora, tarefa['id'], worker))
+        conn.close()
+
+    def get_status(self, tarefa_id):
+        """Status de uma tarefa para consulta (polling) pelo cliente"""
+        conn = self.get_connection()
+        row = conn.execute('''
+            SELECT id, tipo, usuario_id, status, tentativas, max_tentativas, resultado, erro,
+                   criada_em, atualizada_em
+            FROM tarefas WHERE id = ?
+        ''', (tarefa_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        status = dict(row)
+        status['resultado'] = json.loads(status['resultado']) if status['resultado'] else None
+        return status
+
+    def limpar_finalizadas(self, dias=None):
+        """Apaga tarefas concluídas ou que falharam há mais de `dias` dias; retorna quantas"""
+        dias = RETENCAO_DIAS if dias is None else dias
+        conn = self.get_connection()
+        cursor = conn.execute('''
+            DELETE FROM tarefas WHERE status IN ('concluida', 'falhou') AND atualizada_em < ?
+        ''', (time.time() - dias * 86400,))
+        removidas = cursor.rowcount
+        conn.close()
+        return removidas
+
+    def executar_proxima(self, worker):
+        """Executa uma tarefa; retorna False se a fila estava vazia"""
+        tarefa = self.reservar(worker)
+        if tarefa is None:
+            return False
+
+        funcao = TAREFAS.get(tarefa['tipo'])
+        try:
+            if funcao is None:
+                raise LookupError(f"Tarefa desconhecida: {tarefa['tipo']}")
+            resultado = funcao(**tarefa['payload'])
+        except Exception:
+            self.falhar(tarefa, worker, traceback.format_exc(limit=5))
+        else:
+            self.concluir(tarefa['id'], worker, resultado)
+        return True
+
+
+def _loop_worker(db_path, numero, modulo_tarefas):
+    # Com spawn/forkserver (macOS, Python 3.14+) o filho não herda TAREFAS: importa quem as registra
+    if modulo_tarefas:
+        importlib.import_module(modulo_tarefas)
+
+    fila = Fila(db_path)
+    worker = f'{socket.gethostname()}:{os.getpid()}:{numero}'
+    parar = []
+    signal.signal(signal.SIGTERM, lambda *_: parar.append(True))
+    signal.signal(signal.SIGINT, lambda *_: parar.append(True))
+
+    proxima_limpeza = time.time()
+    while not parar:
+        if time.time() >= proxima_limpeza:
+            fila.limpar_finalizadas()
+            proxima_limpeza = time.time() + INTERVALO_LIMPEZA
+        if not fila.executar_proxima(worker):
+            time.sleep(INTERVALO_CONSULTA)
+
+
+def iniciar_workers(num_processos, db_path=None, modulo_tarefas=None):
+    """Inicia N processos worker (que importam modulo_tarefas) e aguarda até receberem SIGTERM/SIGINT"""
+    fila = Fila(db_path)
+    fila.init_db()
+
+    processos = [
+        multiprocessing.Process(target=_loop_worker, args=(fila.db_path, numero, modulo_tarefas), daemon=False)
+        for numero in range(num_processos)
+    ]
+    for processo in processos:
+        processo.start()
+
+    # Repassa o sinal aos filhos; cada um termina a tarefa atual antes de sair
+    def encerrar(*_):
+        for processo in processos:
+            if processo.is_alive():
+                processo.terminate()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+    for processo in processos:
+        processo.join()
@@ -0,0 +1,69 @@
+"""
+Cache de fragmentos de templates Jinja
+Guarda o HTML já renderizado de trechos de página em um LRU limitado, com
+chave formada pelo nome do fragmento, parâmetros e versão dos dados. As
+escritas no banco incrementam a versão (ver Database._registrar_alteracao)
+e avisam este cache, que descarta os fragmentos afetados.
+
+Uso no template:
+    {% call cache_fragmento('galeria/projetos', dominios=['robotica', 'usuarios']) %}
+        ...
+    {% endcall %}
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+FRAGMENTOS_MAX = int(os.environ.get('FRAGMENTOS_MAX', 256))
+
+
+class CacheFragmentos:
+    def __init__(self, max_itens=None):
+        self.max_itens = max_itens or FRAGMENTOS_MAX
+        self.itens = OrderedDict()
+        self.lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave):
+        with self.lock:
+            item = self.itens.get(chave)
+            if item is None:
+                self.falhas += 1
+                return None
+            self.itens.move_to_end(chave)
+            self.acertos += 1
+            return item[1]
+
+    def guardar(self, chave, dominios, html):
+        with self.lock:
+            self.itens[chave] = (frozenset(dominios), html)
+            self.itens.move_to_end(chave)
+            while len(self.itens) > self.max_itens:
+                self.itens.popitem(last=False)
+
+    def invalidar(self, dominio):
+        """Descarta os fragmentos que dependem do domínio alterado"""
+        with self.lock:
+            for chave in [c for c, (dominios, _) in self.itens.items() if dominio in dominios]:
+                del self.itens[chave]
+
+    def limpar(self):
+        with self.lock:
+            self.itens.clear()
+
+    def fragmento(self, nome, dominios, versoes, caller, **params):
+        """Retorna o HTML do fragmento do cache ou renderiza (caller) e guarda"""
+        chave = (
+            nome,
+            tuple(sorted(params.items())),
+            tuple((dominio, versoes.get(dominio, 0)) for dominio in sorted(dominios))
+        )
+        html = self.obter(chave)
+        if html is None:
+            html = Markup(caller())
+            self.guardar(chave, dominios, html)
+        return html
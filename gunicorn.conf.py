@@ -0,0 +1,27 @@
+"""
+Configuração do Gunicorn para produção
+Uso: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Workers com threads: as rotas async do Flask rodam cada uma em seu próprio
+# event loop, então um worker "sync" ficaria preso durante todo o I/O.
+# Com gthread cada processo atende várias requisições ao mesmo tempo e as
+# consultas ao banco são distribuídas no pool limitado de async_db.
+worker_class = 'gthread'
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = 30
+keepalive = 5
+
+
+def post_worker_init(worker):
+    # Carrega o snapshot das análises do professor antes da primeira requisição
+    from analises import obter_snapshot
+    from app import db
+    obter_snapshot(db).aquecer()
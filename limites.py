@@ -0,0 +1,147 @@
+"""
+Controle de admissão para rotas caras
+Balde de fichas (token bucket) por usuário e rota + limite de requisições
+simultâneas por classe de rota. O estado fica em um SQLite local para ser
+compartilhado entre os workers do Gunicorn.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LIMITES_DATABASE = os.environ.get('LIMITES_DATABASE', os.path.join(BASE_DIR, 'limites.db'))
+
+# taxa: fichas por segundo | capacidade: rajada máxima | concorrencia: requisições simultâneas
+LIMITES_PADRAO = {
+    'avaliacao': {'taxa': 0.2, 'capacidade': 5, 'concorrencia': 8},
+    'matematica': {'taxa': 2.0, 'capacidade': 10, 'concorrencia': 32},
+    'robotica': {'taxa': 0.1, 'capacidade': 3, 'concorrencia': 4},
+}
+
+# Vagas de concorrência órfãs (worker que morreu) expiram após este tempo
+TTL_VAGA = 60
+
+# Espera máxima pela trava do SQLite (segundos); esgotada, a requisição passa sem limite
+ESPERA_TRAVA = float(os.environ.get('LIMITES_ESPERA_TRAVA', 0.3))
+
+logger = logging.getLogger(__name__)
+
+
+class Limitador:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or LIMITES_DATABASE
+        self.liberadas_sem_estado = 0  # requisições admitidas porque o estado estava indisponível
+        conn = self.get_connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        # cheio_em: quando o balde estará cheio de novo; depois disso a linha equivale a
+        # um balde novo e pode ser apagada (senão a tabela cresce com cada usuário x rota)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS baldes (
+                chave TEXT PRIMARY KEY,
+                fichas REAL NOT NULL,
+                atualizado REAL NOT NULL,
+                cheio_em REAL NOT NULL DEFAULT 0
+            )
+        ''')
+        colunas = [col[1] for col in conn.execute('PRAGMA table_info(baldes)')]
+        if 'cheio_em' not in colunas:
+            conn.execute('ALTER TABLE baldes ADD COLUMN cheio_em REAL NOT NULL DEFAULT 0')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_baldes_cheio ON baldes (cheio_em)')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS vagas (
+                token TEXT PRIMARY KEY,
+                classe TEXT NOT NULL,
+                inicio REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_vagas_classe ON vagas (classe, inicio)')
+        conn.commit()
+        conn.close()
+
+    def get_connection(self):
+        # Estado efêmero: sem fsync e com espera limitada; travamentos liberam a requisição
+        conn = sqlite3.connect(self.db_path, timeout=ESPERA_TRAVA, isolation_level=None)
+        conn.execute('PRAGMA synchronous=OFF')
+        return conn
+
+    def _liberar_sem_estado(self, operacao, erro):
+        self.liberadas_sem_estado += 1
+        logger.warning('Limitador indisponível em %s (%s): requisição admitida sem limite (%d no processo)',
+                       operacao, erro, self.liberadas_sem_estado)
+
+    def consumir(self, chave, taxa, capacidade):
+        """
+        Tenta consumir uma ficha do balde.
+        Retorna (permitido, segundos_para_nova_tentativa).
+        """
+        agora = time.time()
+        try:
+            conn = self.get_connection()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                # Baldes que já voltaram a ficar cheios: o mesmo que não existir
+                conn.execute('DELETE FROM baldes WHERE cheio_em < ?', (agora,))
+                row = conn.execute('SELECT fichas, atualizado FROM baldes WHERE chave = ?', (chave,)).fetchone()
+                fichas = capacidade if row is None else min(capacidade, row[0] + (agora - row[1]) * taxa)
+
+                permitido = fichas >= 1
+                if permitido:
+                    fichas -= 1
+                cheio_em = agora + (capacidade - fichas) / taxa
+                conn.execute('''
+                    INSERT INTO baldes (chave, fichas, atualizado, cheio_em) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (chave) DO UPDATE SET
+                        fichas = excluded.fichas, atualizado = excluded.atualizado, cheio_em = excluded.cheio_em
+                ''', (chave, fichas, agora, cheio_em))
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as erro:
+            self._liberar_sem_estado('consumir', erro)
+            return True, 0
+
+        if permitido:
+            return True, 0
+        return False, max(1, math.ceil((1 - fichas) / taxa))
+
+    def adquirir(self, classe, limite):
+        """
+        Reserva uma vaga de execução na classe.
+        Retorna o token da vaga, None se a classe estiver lotada ou '' se o
+        estado estiver indisponível (a requisição segue sem vaga).
+        """
+        agora = time.time()
+        token = uuid.uuid4().hex
+        try:
+            conn = self.get_connection()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('DELETE FROM vagas WHERE classe = ? AND inicio < ?', (classe, agora - TTL_VAGA))
+                ocupadas = conn.execute('SELECT COUNT(*) FROM vagas WHERE classe = ?', (classe,)).fetchone()[0]
+                if ocupadas >= limite:
+                    conn.execute('COMMIT')
+                    return None
+                conn.execute('INSERT INTO vagas (token, classe, inicio) VALUES (?, ?, ?)', (token, classe, agora))
+                conn.execute('COMMIT')
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as erro:
+            self._liberar_sem_estado('adquirir', erro)
+            return ''
+        return token
+
+    def liberar(self, token):
+        if not token:
+            return
+        try:
+            conn = self.get_connection()
+            try:
+                conn.execute('DELETE FROM vagas WHERE token = ?', (token,))
+            finally:
+                conn.close()
+        except sqlite3.OperationalError:
+            pass
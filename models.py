@@ -4,19 +4,151 @@ Modelos e operações do banco de dados SQLite
 
 import sqlite3
 import hashlib
+import html
+import json
 import os
-from datetime import datetime
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+import similaridade
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE = os.path.join(BASE_DIR, 'database.db')
 
+# Arquivamento: resultados mais antigos que o horizonte viram resumos diários
+HORIZONTE_ARQUIVO_DIAS = int(os.environ.get('HORIZONTE_ARQUIVO_DIAS', 180))
+ARQUIVO_DATABASE = os.environ.get('ARQUIVO_DATABASE')  # opcional: banco separado para as linhas frias
+
+# Compressão dos textos de avaliação: zlib por padrão. zstd só com TEXTOS_COMPRESSAO=zstd, pois
+# um banco com textos zstd só pode ser lido onde o pacote zstandard estiver instalado
+TEXTOS_COMPRESSAO = os.environ.get('TEXTOS_COMPRESSAO', 'zlib')
+
+# Esquema de avaliações IA (o texto fica em textos_avaliacao, referenciado pelo hash)
+SCHEMA_AVALIACOES_IA = '''
+    CREATE TABLE IF NOT EXISTS {tabela} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        usuario_id INTEGER NOT NULL,
+        texto_hash TEXT NOT NULL,
+        nivel_classificacao TEXT CHECK(nivel_classificacao IN 
+            ('Iniciante', 'Intermediário', 'Proficiente', 'Avançado')) NOT NULL,
+        feedback TEXT NOT NULL,
+        pontuacao INTEGER,
+        data_avaliacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        chave_idempotencia TEXT,
+        FOREIGN KEY (usuario_id) REFERENCES usuarios (id),
+        FOREIGN KEY (texto_hash) REFERENCES textos_avaliacao (hash)
+    )
+'''
+
+INDICE_AVALIACOES_TEXTO = '''
+    CREATE INDEX IF NOT EXISTS idx_avaliacoes_texto_hash ON {tabela} (texto_hash)
+'''
+
+# Uma gravação repetida (tarefa reexecutada pela fila) com a mesma chave não duplica a avaliação
+INDICE_AVALIACOES_CHAVE = '''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_avaliacoes_chave ON {tabela} (chave_idempotencia)
+    WHERE chave_idempotencia IS NOT NULL
+'''
+
+# Busca textual (FTS5): sem acentos e com índices de prefixo, "robo" encontra "robôs" e "robótica"
+TOKENIZADOR_BUSCA = "unicode61 remove_diacritics 2"
+MAX_TERMOS_BUSCA = 10
+
+# Os textos ficam comprimidos; o índice lê o conteúdo por esta view (função descomprimir_texto)
+ESQUEMA_BUSCA = f'''
+    CREATE VIEW IF NOT EXISTS conteudo_busca_textos AS
+    SELECT a.id AS id, descomprimir_texto(t.compressao, t.conteudo) AS texto
+    FROM avaliacoes_ia a
+    JOIN textos_avaliacao t ON t.hash = a.texto_hash;
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS busca_projetos USING fts5(
+        titulo, descricao,
+        content='projetos_robotica', content_rowid='id',
+        tokenize="{TOKENIZADOR_BUSCA}", prefix='2 3 4'
+    );
+
+    CREATE VIRTUAL TABLE IF NOT EXISTS busca_textos USING fts5(
+        texto,
+        content='conteudo_busca_textos', content_rowid='id',
+        tokenize="{TOKENIZADOR_BUSCA}", prefix='2 3 4'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS busca_projetos_ai AFTER INSERT ON projetos_robotica BEGIN
+        INSERT INTO busca_projetos (rowid, titulo, descricao) VALUES (new.id, new.titulo, new.descricao);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS busca_projetos_ad AFTER DELETE ON projetos_robotica BEGIN
+        INSERT INTO busca_projetos (busca_projetos, rowid, titulo, descricao)
+        VALUES ('delete', old.id, old.titulo, old.descricao);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS busca_projetos_au AFTER UPDATE OF titulo, descricao ON projetos_robotica BEGIN
+        INSERT INTO busca_projetos (busca_projetos, rowid, titulo, descricao)
+        VALUES ('delete', old.id, old.titulo, old.descricao);
+        INSERT INTO busca_projetos (rowid, titulo, descricao) VALUES (new.id, new.titulo, new.descricao);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS busca_textos_ai AFTER INSERT ON avaliacoes_ia BEGIN
+        INSERT INTO busca_textos (rowid, texto)
+        SELECT new.id, descomprimir_texto(compressao, conteudo) FROM textos_avaliacao WHERE hash = new.texto_hash;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS busca_textos_ad AFTER DELETE ON avaliacoes_ia BEGIN
+        INSERT INTO busca_textos (busca_textos, rowid, texto)
+        SELECT 'delete', old.id, descomprimir_texto(compressao, conteudo) FROM textos_avaliacao WHERE hash = old.texto_hash;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS busca_textos_au AFTER UPDATE OF texto_hash ON avaliacoes_ia BEGIN
+        INSERT INTO busca_textos (busca_textos, rowid, texto)
+        SELECT 'delete', old.id, descomprimir_texto(compressao, conteudo) FROM textos_avaliacao WHERE hash = old.texto_hash;
+        INSERT INTO busca_textos (rowid, texto)
+        SELECT new.id, descomprimir_texto(compressao, conteudo) FROM textos_avaliacao WHERE hash = new.texto_hash;
+    END;
+'''
+
+def expressao_busca(consulta):
+    """Converte o texto digitado em uma consulta FTS5 segura: todos os termos, por prefixo"""
+    termos = re.findall(r'\w+', consulta.lower())[:MAX_TERMOS_BUSCA]
+    return ' '.join(f'"{termo}"*' for termo in termos)
+
+def destacar_trecho(trecho):
+    """Escapa o trecho retornado por snippet() e marca os termos encontrados com <mark>"""
+    return html.escape(trecho).replace('\x02', '<mark>').replace('\x03', '</mark>')
+
+def _zstandard():
+    if zstandard is None:
+        raise RuntimeError("Textos comprimidos com zstd exigem o pacote 'zstandard' (pip install zstandard)")
+    return zstandard
+
+def comprimir_texto(texto):
+    """Comprime o texto com zlib, ou zstd se TEXTOS_COMPRESSAO=zstd"""
+    dados = texto.encode('utf-8')
+    if TEXTOS_COMPRESSAO == 'zstd':
+        return 'zstd', _zstandard().ZstdCompressor(level=10).compress(dados)
+    return 'zlib', zlib.compress(dados, 9)
+
+def descomprimir_texto(compressao, conteudo):
+    if compressao == 'zstd':
+        dados = _zstandard().ZstdDecompressor().decompress(conteudo)
+    else:
+        dados = zlib.decompress(conteudo)
+    return dados.decode('utf-8')
+
 class Database:
     def __init__(self, db_path=None):
         self.db_path = db_path or DATABASE
+        self.ouvintes_alteracao = []
     
     def get_connection(self):
         conn = sqlite3.connect(self.db_path)
         conn.row_factory = sqlite3.Row
+        # Usada pelos gatilhos e pela view do índice de busca das avaliações
+        conn.create_function('descomprimir_texto', 2, descomprimir_texto, deterministic=True)
         return conn
     
     def init_db(self):
@@ -49,18 +181,111 @@ class Database:
             )
         ''')
         
-        # Tabela de avaliações IA
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS avaliacoes_ia (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+            CREATE INDEX IF NOT EXISTS idx_resultados_matematica_data
+            ON resultados_matematica (data_jogo)
+        ''')
+        
+        # Somas por aluno (pontuação, histórico, ranking) sem varrer a tabela inteira
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_resultados_matematica_usuario
+            ON resultados_matematica (usuario_id, pontuacao)
+        ''')
+        
+        # Resumo diário (usuário, dia, nível) dos resultados já arquivados
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resumo_matematica_diario (
                 usuario_id INTEGER NOT NULL,
-                texto TEXT NOT NULL,
-                nivel_classificacao TEXT CHECK(nivel_classificacao IN 
-                    ('Iniciante', 'Intermediário', 'Proficiente', 'Avançado')) NOT NULL,
-                feedback TEXT NOT NULL,
-                pontuacao INTEGER,
-                data_avaliacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                dia TEXT NOT NULL,
+                nivel TEXT CHECK(nivel IN ('facil', 'medio', 'dificil')) NOT NULL,
+                pontuacao INTEGER NOT NULL,
+                quantidade INTEGER NOT NULL,
+                PRIMARY KEY (usuario_id, dia, nivel),
                 FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Linhas frias originais (quando não há banco de arquivo separado)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS resultados_matematica_arquivo (
+                id INTEGER PRIMARY KEY,
+                usuario_id INTEGER NOT NULL,
+                nivel TEXT NOT NULL,
+                pontuacao INTEGER NOT NULL,
+                data_jogo TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_resultados_arquivo_usuario
+            ON resultados_matematica_arquivo (usuario_id, data_jogo)
+        ''')
+        
+        # Visão única: linhas quentes + resumos. Todas as leituras usam esta visão
+        cursor.execute('''
+            CREATE VIEW IF NOT EXISTS pontos_matematica AS
+            SELECT usuario_id, nivel, pontuacao, 1 AS quantidade, data_jogo
+            FROM resultados_matematica
+            UNION ALL
+            SELECT usuario_id, nivel, pontuacao, quantidade, dia AS data_jogo
+            FROM resumo_matematica_diario
+        ''')
+        
+        # Textos das avaliações: comprimidos e deduplicados pelo hash do conteúdo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS textos_avaliacao (
+                hash TEXT PRIMARY KEY,
+                compressao TEXT NOT NULL,
+                conteudo BLOB NOT NULL,
+                tamanho INTEGER NOT NULL
+            )
+        ''')
+        
+        # Sem o zstandard, textos zstd quebrariam leituras e os gatilhos de busca: falha já aqui
+        if zstandard is None:
+            cursor.execute("SELECT 1 FROM textos_avaliacao WHERE compressao = 'zstd' LIMIT 1")
+            if cursor.fetchone():
+                conn.close()
+                _zstandard()
+        
+        # Tabela de avaliações IA
+        cursor.execute(SCHEMA_AVALIACOES_IA.format(tabela='avaliacoes_ia'))
+        
+        # Bancos antigos guardavam o texto direto em avaliacoes_ia
+        cursor.execute('PRAGMA table_info(avaliacoes_ia)')
+        colunas = [col['name'] for col in cursor.fetchall()]
+        legado = 'texto' in colunas
+        if not legado:
+            if 'chave_idempotencia' not in colunas:
+                cursor.execute('ALTER TABLE avaliacoes_ia ADD COLUMN chave_idempotencia TEXT')
+            cursor.execute(INDICE_AVALIACOES_TEXTO.format(tabela='avaliacoes_ia'))
+            cursor.execute(INDICE_AVALIACOES_CHAVE.format(tabela='avaliacoes_ia'))
+        
+        # Índice MinHash/LSH para detecção de textos semelhantes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS minhash_assinaturas (
+                texto_hash TEXT PRIMARY KEY,
+                assinatura BLOB NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS lsh_bandas (
+                banda INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                texto_hash TEXT NOT NULL,
+                PRIMARY KEY (banda, bucket, texto_hash)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Pares de avaliações de alunos diferentes com textos semelhantes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS avaliacoes_similares (
+                avaliacao_id INTEGER NOT NULL,
+                similar_id INTEGER NOT NULL,
+                similaridade REAL NOT NULL,
+                data_deteccao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (avaliacao_id, similar_id),
+                FOREIGN KEY (avaliacao_id) REFERENCES avaliacoes_ia (id),
+                FOREIGN KEY (similar_id) REFERENCES avaliacoes_ia (id)
             )
         ''')
         
@@ -80,10 +305,73 @@ class Database:
             )
         ''')
         
+        # Resultados do avaliador de textos, por hash do texto normalizado + tema + versão
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS cache_avaliacoes (
+                chave TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL,
+                resultado TEXT NOT NULL,
+                criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Versão dos dados por domínio (invalidação de caches entre workers)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS versoes_dados (
+                dominio TEXT PRIMARY KEY,
+                versao INTEGER NOT NULL
+            )
+        ''')
+        
+        # Relatórios das migrações de esquema executadas (ex.: textos_avaliacao)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS relatorios_migracao (
+                nome TEXT PRIMARY KEY,
+                relatorio TEXT NOT NULL,
+                data_execucao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         conn.commit()
         conn.close()
+        
+        if legado:
+            relatorio = self.migrar_textos_avaliacoes()
+            print(f"✅ Textos de avaliações migrados: {relatorio['bytes_economizados']} bytes economizados")
+        
+        # Depois da migração, que recria avaliacoes_ia (e descartaria os gatilhos)
+        self._criar_indices_busca()
+        
         print("✅ Banco de dados inicializado com sucesso!")
     
+    # ==================== VERSÕES E INVALIDAÇÃO ====================
+    
+    def ao_alterar(self, callback):
+        """Registra uma função chamada com o domínio sempre que uma escrita é confirmada"""
+        self.ouvintes_alteracao.append(callback)
+    
+    def _registrar_alteracao(self, cursor, dominio):
+        """Incrementa a versão do domínio na mesma transação da escrita"""
+        cursor.execute('''
+            INSERT INTO versoes_dados (dominio, versao) VALUES (?, 1)
+            ON CONFLICT (dominio) DO UPDATE SET versao = versao + 1
+        ''', (dominio,))
+    
+    def _notificar_alteracao(self, dominio):
+        for callback in self.ouvintes_alteracao:
+            callback(dominio)
+    
+    def get_versoes_dados(self):
+        """Retorna {domínio: versão} dos dados (usuarios, matematica, avaliacao_ia, robotica)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT dominio, versao FROM versoes_dados')
+        versoes = {row['dominio']: row['versao'] for row in cursor.fetchall()}
+        
+        conn.close()
+        return versoes
+    
     # ==================== OPERAÇÕES DE USUÁRIO ====================
     
     def hash_senha(self, senha):
@@ -103,8 +391,10 @@ class Database:
                 VALUES (?, ?, ?, ?, ?)
             ''', (nome, escola, serie, senha_hash, tipo))
             
+            self._registrar_alteracao(cursor, 'usuarios')
             conn.commit()
             conn.close()
+            self._notificar_alteracao('usuarios')
             return True
         except sqlite3.IntegrityError:
             return False
@@ -149,8 +439,10 @@ class Database:
             VALUES (?, ?, ?)
         ''', (usuario_id, nivel, pontuacao))
         
+        self._registrar_alteracao(cursor, 'matematica')
         conn.commit()
         conn.close()
+        self._notificar_alteracao('matematica')
     
     def get_ranking_geral(self, limit=10):
         """Retorna ranking geral dos alunos"""
@@ -160,9 +452,9 @@ class Database:
         cursor.execute('''
             SELECT u.nome, u.escola, 
                    COALESCE(SUM(r.pontuacao), 0) as total_pontos,
-                   COUNT(r.id) as questoes_respondidas
+                   COALESCE(SUM(r.quantidade), 0) as questoes_respondidas
             FROM usuarios u
-            LEFT JOIN resultados_matematica r ON u.id = r.usuario_id
+            LEFT JOIN pontos_matematica r ON u.id = r.usuario_id
             WHERE u.tipo = 'aluno'
             GROUP BY u.id
             ORDER BY total_pontos DESC
@@ -182,7 +474,7 @@ class Database:
             SELECT u.nome, u.serie,
                    COALESCE(SUM(r.pontuacao), 0) as total_pontos
             FROM usuarios u
-            LEFT JOIN resultados_matematica r ON u.id = r.usuario_id
+            LEFT JOIN pontos_matematica r ON u.id = r.usuario_id
             WHERE u.escola = ? AND u.tipo = 'aluno'
             GROUP BY u.id
             ORDER BY total_pontos DESC
@@ -193,25 +485,414 @@ class Database:
         conn.close()
         return ranking
     
+    def get_ranking_escola_do_usuario(self, user_id, limit=10):
+        """Ranking da escola do usuário, resolvida na própria consulta (sem buscar o usuário antes)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT u.nome, u.serie,
+                   COALESCE(SUM(r.pontuacao), 0) as total_pontos
+            FROM usuarios u
+            LEFT JOIN pontos_matematica r ON u.id = r.usuario_id
+            WHERE u.escola = (SELECT escola FROM usuarios WHERE id = ?) AND u.tipo = 'aluno'
+            GROUP BY u.id
+            ORDER BY total_pontos DESC
+            LIMIT ?
+        ''', (user_id, limit))
+        
+        ranking = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return ranking
+    
     # ==================== OPERAÇÕES AVALIAÇÃO IA ====================
     
-    def salvar_avaliacao_ia(self, usuario_id, texto, nivel_classificacao, feedback, pontuacao=None):
-        """Salva avaliação de texto"""
+    def _salvar_texto(self, cursor, texto):
+        """Guarda o texto comprimido (uma única vez por conteúdo) e retorna seu hash"""
+        texto_hash = hashlib.sha256(texto.encode('utf-8')).hexdigest()
+        cursor.execute('SELECT 1 FROM textos_avaliacao WHERE hash = ?', (texto_hash,))
+        if cursor.fetchone() is None:
+            compressao, conteudo = comprimir_texto(texto)
+            cursor.execute('''
+                INSERT OR IGNORE INTO textos_avaliacao (hash, compressao, conteudo, tamanho)
+                VALUES (?, ?, ?, ?)
+            ''', (texto_hash, compressao, conteudo, len(texto.encode('utf-8'))))
+            self._indexar_similaridade(cursor, texto_hash, texto)
+        return texto_hash
+    
+    def salvar_avaliacao_ia(self, usuario_id, texto, nivel_classificacao, feedback, pontuacao=None,
+                            chave_idempotencia=None):
+        """Salva avaliação de texto; com chave_idempotencia, repetir a chamada retorna a mesma avaliação"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        if chave_idempotencia:
+            existente = self._avaliacao_por_chave(cursor, chave_idempotencia)
+            if existente is not None:
+                conn.close()
+                return existente
+        
         # Extrair pontuação do nível
         pontos_nivel = {'Iniciante': 25, 'Intermediário': 50, 'Proficiente': 75, 'Avançado': 100}
         pontuacao = pontuacao or pontos_nivel.get(nivel_classificacao, 0)
         
+        texto_hash = self._salvar_texto(cursor, texto)
+        try:
+            cursor.execute('''
+                INSERT INTO avaliacoes_ia (usuario_id, texto_hash, nivel_classificacao, feedback, pontuacao,
+                                           chave_idempotencia)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (usuario_id, texto_hash, nivel_classificacao, feedback, pontuacao, chave_idempotencia))
+        except sqlite3.IntegrityError:
+            # Outra execução da mesma tarefa gravou primeiro
+            conn.rollback()
+            existente = self._avaliacao_por_chave(cursor, chave_idempotencia)
+            conn.close()
+            if existente is None:
+                raise
+            return existente
+        
+        avaliacao_id = cursor.lastrowid
+        # Textos curtos não são comparados (assinaturas antigas deles somem no varrer-copias)
+        if not similaridade.curto_demais(texto):
+            self._registrar_similares(cursor, avaliacao_id, usuario_id, texto_hash)
+        self._registrar_alteracao(cursor, 'avaliacao_ia')
+        conn.commit()
+        conn.close()
+        self._notificar_alteracao('avaliacao_ia')
+        return avaliacao_id
+    
+    def _avaliacao_por_chave(self, cursor, chave_idempotencia):
+        cursor.execute('SELECT id FROM avaliacoes_ia WHERE chave_idempotencia = ?', (chave_idempotencia,))
+        row = cursor.fetchone()
+        return row['id'] if row else None
+    
+    def get_texto_avaliacao(self, avaliacao_id):
+        """Retorna o texto original de uma avaliação"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT t.compressao, t.conteudo
+            FROM avaliacoes_ia a
+            JOIN textos_avaliacao t ON t.hash = a.texto_hash
+            WHERE a.id = ?
+        ''', (avaliacao_id,))
+        
+        row = cursor.fetchone()
+        conn.close()
+        return descomprimir_texto(row['compressao'], row['conteudo']) if row else None
+    
+    def migrar_textos_avaliacoes(self):
+        """
+        Migra avaliacoes_ia do formato antigo (coluna texto) para textos_avaliacao.
+        Retorna um relatório do espaço economizado.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('PRAGMA page_count')
+        paginas_antes = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_size')
+        tamanho_pagina = cursor.fetchone()[0]
+        
+        cursor.execute('PRAGMA table_info(avaliacoes_ia)')
+        legado = any(col['name'] == 'texto' for col in cursor.fetchall())
+        
+        bytes_originais = 0
+        total = 0
+        if legado:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute(SCHEMA_AVALIACOES_IA.format(tabela='avaliacoes_ia_nova'))
+            cursor.execute(INDICE_AVALIACOES_TEXTO.format(tabela='avaliacoes_ia_nova'))
+            cursor.execute(INDICE_AVALIACOES_CHAVE.format(tabela='avaliacoes_ia_nova'))
+            
+            leitura = conn.cursor()
+            leitura.execute('''
+                SELECT id, usuario_id, texto, nivel_classificacao, feedback, pontuacao, data_avaliacao
+                FROM avaliacoes_ia ORDER BY id
+            ''')
+            for row in leitura:
+                texto_hash = self._salvar_texto(cursor, row['texto'])
+                bytes_originais += len(row['texto'].encode('utf-8'))
+                total += 1
+                cursor.execute('''
+                    INSERT INTO avaliacoes_ia_nova
+                    (id, usuario_id, texto_hash, nivel_classificacao, feedback, pontuacao, data_avaliacao)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (row['id'], row['usuario_id'], texto_hash, row['nivel_classificacao'],
+                      row['feedback'], row['pontuacao'], row['data_avaliacao']))
+            
+            cursor.execute('DROP TABLE avaliacoes_ia')
+            cursor.execute('ALTER TABLE avaliacoes_ia_nova RENAME TO avaliacoes_ia')
+            conn.commit()
+            cursor.execute('VACUUM')
+        
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(length(conteudo)), 0) FROM textos_avaliacao')
+        textos_unicos, bytes_armazenados = cursor.fetchone()
+        if not legado:
+            # Tamanho que os textos teriam sem deduplicação nem compressão (um por avaliação)
+            cursor.execute('''
+                SELECT COALESCE(SUM(t.tamanho), 0)
+                FROM avaliacoes_ia a
+                JOIN textos_avaliacao t ON t.hash = a.texto_hash
+            ''')
+            bytes_originais = cursor.fetchone()[0]
+        cursor.execute('PRAGMA page_count')
+        paginas_depois = cursor.fetchone()[0]
+        
+        relatorio = {
+            'avaliacoes_migradas': total,
+            'textos_unicos': textos_unicos,
+            'bytes_originais': bytes_originais,
+            'bytes_armazenados': bytes_armazenados,
+            'bytes_economizados': bytes_originais - bytes_armazenados,
+            'tamanho_banco_antes': paginas_antes * tamanho_pagina,
+            'tamanho_banco_depois': paginas_depois * tamanho_pagina
+        }
+        
+        # Guarda o relatório: a migração costuma rodar no init_db, antes de qualquer comando
+        if legado:
+            cursor.execute('''
+                INSERT OR REPLACE INTO relatorios_migracao (nome, relatorio) VALUES ('textos_avaliacao', ?)
+            ''', (json.dumps(relatorio),))
+            conn.commit()
+        conn.close()
+        return relatorio
+    
+    def get_relatorio_migracao(self, nome):
+        """Relatório salvo de uma migração já executada (ou None)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT relatorio, data_execucao FROM relatorios_migracao WHERE nome = ?', (nome,))
+        row = cursor.fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return dict(json.loads(row['relatorio']), data_execucao=row['data_execucao'])
+    
+    # ==================== TEXTOS SEMELHANTES (MINHASH/LSH) ====================
+    
+    def _indexar_similaridade(self, cursor, texto_hash, texto):
+        """Calcula a assinatura MinHash do texto e grava suas bandas LSH (None se curto demais)"""
+        assinatura = similaridade.assinatura_minhash(texto)
+        if assinatura is None:
+            return None
+        cursor.execute('''
+            INSERT OR IGNORE INTO minhash_assinaturas (texto_hash, assinatura) VALUES (?, ?)
+        ''', (texto_hash, similaridade.assinatura_para_bytes(assinatura)))
+        cursor.executemany('''
+            INSERT OR IGNORE INTO lsh_bandas (banda, bucket, texto_hash) VALUES (?, ?, ?)
+        ''', [(banda, bucket, texto_hash) for banda, bucket in similaridade.bandas_lsh(assinatura)])
+        return assinatura
+    
+    def _candidatos_similares(self, cursor, assinatura, limiar=None):
+        """Textos que colidem em alguma banda LSH e passam no limiar de similaridade"""
+        limiar = similaridade.LIMIAR_SIMILARIDADE if limiar is None else limiar
+        bandas = similaridade.bandas_lsh(assinatura)
+        
+        # CTE em vez de IN (VALUES ...) para que o SQLite use a chave primária de lsh_bandas
+        cursor.execute(f'''
+            WITH consulta (banda, bucket) AS (VALUES {', '.join(['(?, ?)'] * len(bandas))})
+            SELECT DISTINCT l.texto_hash, m.assinatura
+            FROM consulta c
+            JOIN lsh_bandas l ON l.banda = c.banda AND l.bucket = c.bucket
+            JOIN minhash_assinaturas m ON m.texto_hash = l.texto_hash
+        ''', [valor for par in bandas for valor in par])
+        
+        candidatos = []
+        for row in cursor.fetchall():
+            estimada = similaridade.jaccard_estimada(
+                assinatura, similaridade.assinatura_de_bytes(row['assinatura'])
+            )
+            if estimada >= limiar:
+                candidatos.append((row['texto_hash'], estimada))
+        candidatos.sort(key=lambda c: c[1], reverse=True)
+        return candidatos
+    
+    def _registrar_similares(self, cursor, avaliacao_id, usuario_id, texto_hash, limite=20):
+        """Registra avaliações de outros alunos semelhantes à avaliação recém-salva"""
+        cursor.execute('SELECT assinatura FROM minhash_assinaturas WHERE texto_hash = ?', (texto_hash,))
+        row = cursor.fetchone()
+        if row is None:
+            return 0
+        
+        pares = []
+        assinatura = similaridade.assinatura_de_bytes(row['assinatura'])
+        for candidato_hash, estimada in self._candidatos_similares(cursor, assinatura):
+            cursor.execute('''
+                SELECT id FROM avaliacoes_ia
+                WHERE texto_hash = ? AND usuario_id != ? AND id != ?
+                ORDER BY id DESC LIMIT ?
+            ''', (candidato_hash, usuario_id, avaliacao_id, limite))
+            valor = 1.0 if candidato_hash == texto_hash else estimada
+            pares.extend((avaliacao_id, r['id'], valor) for r in cursor.fetchall())
+        
+        cursor.executemany('''
+            INSERT OR IGNORE INTO avaliacoes_similares (avaliacao_id, similar_id, similaridade)
+            VALUES (?, ?, ?)
+        ''', pares)
+        return len(pares)
+    
+    def buscar_textos_similares(self, texto, limiar=None):
+        """Retorna os textos armazenados semelhantes a um texto (sem gravar nada)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        assinatura = similaridade.assinatura_minhash(texto)
+        candidatos = self._candidatos_similares(cursor, assinatura, limiar) if assinatura is not None else []
+        
+        conn.close()
+        return [{'texto_hash': h, 'similaridade': round(s, 3)} for h, s in candidatos]
+    
+    def varrer_textos_similares(self, limiar=None):
+        """
+        Varredura completa: indexa textos ainda sem assinatura e registra todos os
+        pares de avaliações (de alunos diferentes) com textos semelhantes.
+        """
+        limiar = similaridade.LIMIAR_SIMILARIDADE if limiar is None else limiar
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        # Textos migrados ou gravados antes do índice existir
+        leitura = conn.cursor()
+        leitura.execute('''
+            SELECT t.hash, t.compressao, t.conteudo
+            FROM textos_avaliacao t
+            LEFT JOIN minhash_assinaturas m ON m.texto_hash = t.hash
+            WHERE m.texto_hash IS NULL
+        ''')
+        for row in leitura.fetchall():
+            self._indexar_similaridade(cursor, row['hash'], descomprimir_texto(row['compressao'], row['conteudo']))
+        
+        # Textos curtos indexados antes de MIN_SHINGLES: sai do índice e dos pares registrados
+        # (com menos de ~12 palavras, 2 KB só seriam ultrapassados com palavras enormes)
+        leitura.execute('''
+            SELECT t.hash, t.compressao, t.conteudo, m.assinatura
+            FROM textos_avaliacao t
+            JOIN minhash_assinaturas m ON m.texto_hash = t.hash
+            WHERE t.tamanho < 2048
+        ''')
+        curtos, bandas_curtos = [], []
+        for row in leitura.fetchall():
+            if similaridade.curto_demais(descomprimir_texto(row['compressao'], row['conteudo'])):
+                curtos.append((row['hash'],))
+                assinatura = similaridade.assinatura_de_bytes(row['assinatura'])
+                bandas_curtos.extend((banda, bucket, row['hash']) for banda, bucket in similaridade.bandas_lsh(assinatura))
+        cursor.executemany('DELETE FROM minhash_assinaturas WHERE texto_hash = ?', curtos)
+        cursor.executemany('DELETE FROM lsh_bandas WHERE banda = ? AND bucket = ? AND texto_hash = ?', bandas_curtos)
+        cursor.executemany('''
+            DELETE FROM avaliacoes_similares
+            WHERE avaliacao_id IN (SELECT id FROM avaliacoes_ia WHERE texto_hash = ?1)
+               OR similar_id IN (SELECT id FROM avaliacoes_ia WHERE texto_hash = ?1)
+        ''', curtos)
+        
+        # Pares de textos que colidem em pelo menos uma banda
+        cursor.execute('''
+            SELECT DISTINCT a.texto_hash AS hash_a, b.texto_hash AS hash_b
+            FROM lsh_bandas a
+            JOIN lsh_bandas b ON a.banda = b.banda AND a.bucket = b.bucket AND a.texto_hash < b.texto_hash
+        ''')
+        pares_texto = [(row['hash_a'], row['hash_b']) for row in cursor.fetchall()]
+        
+        cursor.execute('SELECT texto_hash, assinatura FROM minhash_assinaturas')
+        assinaturas = {row['texto_hash']: similaridade.assinatura_de_bytes(row['assinatura'])
+                       for row in cursor.fetchall()}
+        
+        # Textos idênticos (mesmo hash) contam com similaridade 1
+        similares = [(h, h, 1.0) for h in assinaturas]
+        for hash_a, hash_b in pares_texto:
+            estimada = similaridade.jaccard_estimada(assinaturas[hash_a], assinaturas[hash_b])
+            if estimada >= limiar:
+                similares.append((hash_a, hash_b, estimada))
+        
+        registrados = 0
+        for hash_a, hash_b, valor in similares:
+            cursor.execute('''
+                INSERT OR IGNORE INTO avaliacoes_similares (avaliacao_id, similar_id, similaridade)
+                SELECT MAX(a.id, b.id), MIN(a.id, b.id), ?
+                FROM avaliacoes_ia a
+                JOIN avaliacoes_ia b ON b.texto_hash = ? AND a.usuario_id != b.usuario_id AND a.id != b.id
+                WHERE a.texto_hash = ?
+            ''', (valor, hash_b, hash_a))
+            registrados += max(cursor.rowcount, 0)
+        
+        conn.commit()
+        conn.close()
+        return registrados
+    
+    def get_avaliacoes_similares(self, limit=50):
+        """Pares de possíveis cópias para o dashboard do professor"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT s.avaliacao_id, s.similar_id, s.similaridade, s.data_deteccao,
+                   ua.nome as aluno, ua.escola as escola,
+                   ub.nome as aluno_similar, ub.escola as escola_similar
+            FROM avaliacoes_similares s
+            JOIN avaliacoes_ia a ON a.id = s.avaliacao_id
+            JOIN avaliacoes_ia b ON b.id = s.similar_id
+            JOIN usuarios ua ON ua.id = a.usuario_id
+            JOIN usuarios ub ON ub.id = b.usuario_id
+            ORDER BY s.data_deteccao DESC, s.similaridade DESC
+            LIMIT ?
+        ''', (limit,))
+        
+        pares = [dict(row) for row in cursor.fetchall()]
+        conn.close()
+        return pares
+    
+    # ==================== CACHE DE AVALIAÇÕES ====================
+    
+    def get_avaliacao_cache(self, chave, versao):
+        """Retorna o resultado guardado para a chave, se for da versão atual do avaliador"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT resultado FROM cache_avaliacoes WHERE chave = ? AND versao = ?', (chave, versao))
+        row = cursor.fetchone()
+        
+        conn.close()
+        return json.loads(row['resultado']) if row else None
+    
+    def salvar_avaliacao_cache(self, chave, versao, resultado, max_itens=None):
+        """Guarda o resultado de uma avaliação, mantendo no máximo max_itens entradas"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
         cursor.execute('''
-            INSERT INTO avaliacoes_ia (usuario_id, texto, nivel_classificacao, feedback, pontuacao)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (usuario_id, texto, nivel_classificacao, feedback, pontuacao))
+            INSERT OR REPLACE INTO cache_avaliacoes (chave, versao, resultado)
+            VALUES (?, ?, ?)
+        ''', (chave, versao, json.dumps(resultado, ensure_ascii=False)))
+        
+        # O rowid cresce com cada gravação (como criado_em): remove as mais antigas pelo intervalo
+        if max_itens:
+            cursor.execute('DELETE FROM cache_avaliacoes WHERE rowid <= ?', (cursor.lastrowid - max_itens,))
         
         conn.commit()
         conn.close()
     
+    def limpar_cache_avaliacoes(self, versao_atual, max_itens=None):
+        """Remove resultados de versões anteriores do avaliador e os que passam de max_itens"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('DELETE FROM cache_avaliacoes WHERE versao != ?', (versao_atual,))
+        removidos = cursor.rowcount
+        if max_itens:
+            cursor.execute('''
+                DELETE FROM cache_avaliacoes WHERE rowid NOT IN (
+                    SELECT rowid FROM cache_avaliacoes ORDER BY rowid DESC LIMIT ?
+                )
+            ''', (max_itens,))
+            removidos += cursor.rowcount
+        
+        conn.commit()
+        conn.close()
+        return removidos
+    
     # ==================== OPERAÇÕES ROBÓTICA ====================
     
     def cadastrar_projeto(self, usuario_id, titulo, descricao, area, nivel, nota, imagem):
@@ -226,8 +907,10 @@ class Database:
         ''', (usuario_id, titulo, descricao, area, nivel, nota, imagem))
         
         projeto_id = cursor.lastrowid
+        self._registrar_alteracao(cursor, 'robotica')
         conn.commit()
         conn.close()
+        self._notificar_alteracao('robotica')
         
         return projeto_id
     
@@ -248,6 +931,105 @@ class Database:
         conn.close()
         return projetos
     
+    # ==================== BUSCA TEXTUAL (FTS5) ====================
+    
+    def _criar_indices_busca(self):
+        """Cria os índices FTS5 e gatilhos; popula os índices na primeira vez"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'busca_projetos'")
+        existia = cursor.fetchone() is not None
+        cursor.executescript(ESQUEMA_BUSCA)
+        conn.commit()
+        conn.close()
+        
+        if not existia:
+            self.reconstruir_indices_busca()
+    
+    def reconstruir_indices_busca(self):
+        """Recria os índices de busca a partir das tabelas e os compacta"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        for indice in ('busca_projetos', 'busca_textos'):
+            cursor.execute(f"INSERT INTO {indice} ({indice}) VALUES ('rebuild')")
+            cursor.execute(f"INSERT INTO {indice} ({indice}) VALUES ('optimize')")
+        conn.commit()
+        
+        cursor.execute('SELECT COUNT(*) FROM projetos_robotica')
+        projetos = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM avaliacoes_ia')
+        textos = cursor.fetchone()[0]
+        conn.close()
+        return {'projetos': projetos, 'textos': textos}
+    
+    def buscar_projetos(self, consulta, area=None, escola=None, nivel=None, limit=20):
+        """Projetos de robótica por relevância (título pesa mais que a descrição)"""
+        expressao = expressao_busca(consulta)
+        if not expressao:
+            return []
+        
+        filtros, params = [], [expressao]
+        for coluna, valor in (('p.area', area), ('u.escola', escola), ('p.nivel', nivel)):
+            if valor:
+                filtros.append(f'AND {coluna} = ?')
+                params.append(valor)
+        params.append(limit)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT p.id, p.titulo, p.area, p.nivel, p.nota, p.imagem, p.data_cadastro,
+                   u.nome AS autor, u.escola,
+                   snippet(busca_projetos, 1, char(2), char(3), '…', 16) AS trecho,
+                   bm25(busca_projetos, 10.0, 1.0) AS relevancia
+            FROM busca_projetos
+            JOIN projetos_robotica p ON p.id = busca_projetos.rowid
+            JOIN usuarios u ON u.id = p.usuario_id
+            WHERE busca_projetos MATCH ? {' '.join(filtros)}
+            ORDER BY relevancia
+            LIMIT ?
+        ''', params)
+        
+        projetos = [dict(row, trecho=destacar_trecho(row['trecho'])) for row in cursor.fetchall()]
+        conn.close()
+        return projetos
+    
+    def buscar_textos(self, consulta, usuario_id=None, escola=None, nivel=None, limit=20):
+        """Avaliações cujo texto contém os termos (usuario_id restringe às do aluno)"""
+        expressao = expressao_busca(consulta)
+        if not expressao:
+            return []
+        
+        filtros, params = [], [expressao]
+        for coluna, valor in (('a.usuario_id', usuario_id), ('u.escola', escola), ('a.nivel_classificacao', nivel)):
+            if valor:
+                filtros.append(f'AND {coluna} = ?')
+                params.append(valor)
+        params.append(limit)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f'''
+            SELECT a.id, a.nivel_classificacao, a.pontuacao, a.data_avaliacao,
+                   u.nome AS aluno, u.escola, u.serie,
+                   snippet(busca_textos, 0, char(2), char(3), '…', 24) AS trecho,
+                   bm25(busca_textos) AS relevancia
+            FROM busca_textos
+            JOIN avaliacoes_ia a ON a.id = busca_textos.rowid
+            JOIN usuarios u ON u.id = a.usuario_id
+            WHERE busca_textos MATCH ? {' '.join(filtros)}
+            ORDER BY relevancia
+            LIMIT ?
+        ''', params)
+        
+        textos = [dict(row, trecho=destacar_trecho(row['trecho'])) for row in cursor.fetchall()]
+        conn.close()
+        return textos
+    
     # ==================== RELATÓRIOS E ESTATÍSTICAS ====================
     
     def get_pontuacao_total(self, usuario_id):
@@ -257,7 +1039,7 @@ class Database:
         
         # Pontos de matemática
         cursor.execute('''
-            SELECT COALESCE(SUM(pontuacao), 0) FROM resultados_matematica 
+            SELECT COALESCE(SUM(pontuacao), 0) FROM pontos_matematica 
             WHERE usuario_id = ?
         ''', (usuario_id,))
         pts_mat = cursor.fetchone()[0] or 0
@@ -286,7 +1068,7 @@ class Database:
         
         if modulo == 'matematica':
             cursor.execute('''
-                SELECT COALESCE(SUM(pontuacao), 0) FROM resultados_matematica 
+                SELECT COALESCE(SUM(pontuacao), 0) FROM pontos_matematica 
                 WHERE usuario_id = ?
             ''', (usuario_id,))
         elif modulo == 'avaliacao_ia':
@@ -307,14 +1089,30 @@ class Database:
         return result
     
     def get_historico_matematica(self, usuario_id):
-        """Retorna histórico de atividades de matemática"""
+        """
+        Retorna histórico de atividades de matemática, uma linha por resposta (inclusive as
+        arquivadas). A parte de um resumo diário sem as linhas originais neste banco (arquivo
+        externo) aparece como uma linha com a quantidade e a pontuação restantes do dia.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT nivel, pontuacao, data_jogo 
-            FROM resultados_matematica 
-            WHERE usuario_id = ?
+            SELECT nivel, pontuacao, 1 AS quantidade, data_jogo
+            FROM resultados_matematica WHERE usuario_id = ?1
+            UNION ALL
+            SELECT nivel, pontuacao, 1 AS quantidade, data_jogo
+            FROM resultados_matematica_arquivo WHERE usuario_id = ?1
+            UNION ALL
+            SELECT r.nivel, r.pontuacao - COALESCE(l.pontos, 0), r.quantidade - COALESCE(l.quantidade, 0),
+                   r.dia AS data_jogo
+            FROM resumo_matematica_diario r
+            LEFT JOIN (
+                SELECT nivel, date(data_jogo) AS dia, SUM(pontuacao) AS pontos, COUNT(*) AS quantidade
+                FROM resultados_matematica_arquivo WHERE usuario_id = ?1
+                GROUP BY nivel, date(data_jogo)
+            ) l ON l.nivel = r.nivel AND l.dia = r.dia
+            WHERE r.usuario_id = ?1 AND r.quantidade > COALESCE(l.quantidade, 0)
             ORDER BY data_jogo DESC
             LIMIT 10
         ''', (usuario_id,))
@@ -361,11 +1159,18 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # Agrega cada tabela da visão pontos_matematica pelo índice antes de juntar:
+        # agrupar direto sobre a visão (UNION ALL) exige uma B-tree temporária com todas as linhas
         cursor.execute('''
-            WITH ranking AS (
-                SELECT usuario_id, SUM(pontuacao) as total,
-                       RANK() OVER (ORDER BY SUM(pontuacao) DESC) as posicao
-                FROM resultados_matematica
+            WITH parciais AS (
+                SELECT usuario_id, SUM(pontuacao) AS total FROM resultados_matematica GROUP BY usuario_id
+                UNION ALL
+                SELECT usuario_id, SUM(pontuacao) AS total FROM resumo_matematica_diario GROUP BY usuario_id
+            ),
+            ranking AS (
+                SELECT usuario_id, SUM(total) as total,
+                       RANK() OVER (ORDER BY SUM(total) DESC) as posicao
+                FROM parciais
                 GROUP BY usuario_id
             )
             SELECT posicao FROM ranking WHERE usuario_id = ?
@@ -397,7 +1202,7 @@ class Database:
         stats['usuarios'] = {row[0]: row[1] for row in cursor.fetchall()}
         
         # Total de atividades por módulo
-        cursor.execute("SELECT COUNT(*) FROM resultados_matematica")
+        cursor.execute("SELECT COALESCE(SUM(quantidade), 0) FROM pontos_matematica")
         stats['total_matematica'] = cursor.fetchone()[0]
         
         cursor.execute("SELECT COUNT(*) FROM avaliacoes_ia")
@@ -407,7 +1212,7 @@ class Database:
         stats['total_projetos'] = cursor.fetchone()[0]
         
         # Média de desempenho
-        cursor.execute("SELECT AVG(pontuacao) FROM resultados_matematica")
+        cursor.execute("SELECT SUM(pontuacao) * 1.0 / SUM(quantidade) FROM pontos_matematica")
         stats['media_matematica'] = round(cursor.fetchone()[0] or 0, 2)
         
         conn.close()
@@ -423,7 +1228,7 @@ class Database:
                    COUNT(DISTINCT u.id) as total_alunos,
                    COALESCE(SUM(r.pontuacao), 0) as pontuacao_total
             FROM usuarios u
-            LEFT JOIN resultados_matematica r ON u.id = r.usuario_id
+            LEFT JOIN pontos_matematica r ON u.id = r.usuario_id
             WHERE u.tipo = 'aluno'
             GROUP BY u.escola
             ORDER BY pontuacao_total DESC
@@ -432,3 +1237,70 @@ class Database:
         escolas = [dict(row) for row in cursor.fetchall()]
         conn.close()
         return escolas
+    
+    # ==================== ARQUIVAMENTO ====================
+    
+    def arquivar_resultados_matematica(self, dias=None, arquivo_path=None):
+        """
+        Move resultados de matemática mais antigos que o horizonte para o arquivo
+        e os compacta em resumos por usuário, dia e nível.
+        As leituras (visão pontos_matematica) continuam retornando os mesmos totais.
+        """
+        dias = HORIZONTE_ARQUIVO_DIAS if dias is None else dias
+        arquivo_path = arquivo_path or ARQUIVO_DATABASE
+        corte = (datetime.now(timezone.utc) - timedelta(days=dias)).strftime('%Y-%m-%d %H:%M:%S')
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        tabela_arquivo = 'resultados_matematica_arquivo'
+        if arquivo_path:
+            cursor.execute('ATTACH DATABASE ? AS arquivo', (arquivo_path,))
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS arquivo.resultados_matematica (
+                    id INTEGER PRIMARY KEY,
+                    usuario_id INTEGER NOT NULL,
+                    nivel TEXT NOT NULL,
+                    pontuacao INTEGER NOT NULL,
+                    data_jogo TIMESTAMP
+                )
+            ''')
+            tabela_arquivo = 'arquivo.resultados_matematica'
+        
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            
+            # Compactar em resumos (somando a resumos já existentes do mesmo dia)
+            cursor.execute('''
+                INSERT INTO resumo_matematica_diario (usuario_id, dia, nivel, pontuacao, quantidade)
+                SELECT usuario_id, date(data_jogo), nivel, SUM(pontuacao), COUNT(*)
+                FROM resultados_matematica
+                WHERE data_jogo < ?
+                GROUP BY usuario_id, date(data_jogo), nivel
+                ON CONFLICT (usuario_id, dia, nivel) DO UPDATE SET
+                    pontuacao = pontuacao + excluded.pontuacao,
+                    quantidade = quantidade + excluded.quantidade
+            ''', (corte,))
+            
+            # Preservar as linhas originais no arquivo
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO {tabela_arquivo} (id, usuario_id, nivel, pontuacao, data_jogo)
+                SELECT id, usuario_id, nivel, pontuacao, data_jogo
+                FROM resultados_matematica
+                WHERE data_jogo < ?
+            ''', (corte,))
+            
+            cursor.execute('DELETE FROM resultados_matematica WHERE data_jogo < ?', (corte,))
+            arquivadas = cursor.rowcount
+            
+            self._registrar_alteracao(cursor, 'matematica')
+            self._registrar_alteracao(cursor, 'arquivamento')  # snapshot de análises recarrega os resumos
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        self._notificar_alteracao('matematica')
+        return arquivadas
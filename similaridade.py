@@ -0,0 +1,128 @@
+"""
+Detecção de textos semelhantes (possíveis cópias) com MinHash + LSH
+Cada texto vira um conjunto de shingles (trigramas de palavras); a assinatura
+MinHash estima a similaridade de Jaccard e as bandas LSH permitem encontrar
+candidatos sem comparar com todos os textos armazenados.
+"""
+
+import hashlib
+import random
+import re
+import unicodedata
+from array import array
+
+import numpy as np
+
+NUM_PERMUTACOES = 128
+BANDAS = 32
+LINHAS_POR_BANDA = NUM_PERMUTACOES // BANDAS
+TAMANHO_SHINGLE = 3
+
+# Similaridade estimada mínima para considerar dois textos como possível cópia
+LIMIAR_SIMILARIDADE = 0.6
+
+# Textos com menos shingles (~12 palavras) não são indexados: vazios ou de uma frase curta
+# teriam assinaturas iguais e virariam "cópias" de 100% entre alunos diferentes
+MIN_SHINGLES = 10
+
+_PRIMO = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_rng = random.Random(20240501)
+_PERMUTACOES = [(_rng.randrange(1, _PRIMO), _rng.randrange(0, _PRIMO)) for _ in range(NUM_PERMUTACOES)]
+
+# Coeficientes em colunas (NUM_PERMUTACOES, 1), separados em 30 + 31 bits para a multiplicação modular
+_A = np.array([a for a, _ in _PERMUTACOES], dtype=np.uint64)[:, None]
+_B = np.array([b for _, b in _PERMUTACOES], dtype=np.uint64)[:, None]
+_A_ALTO, _A_BAIXO = _A >> np.uint64(31), _A & np.uint64((1 << 31) - 1)
+_P = np.uint64(_PRIMO)
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e sem pontuação"""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.findall(r'\w+', texto)
+
+
+def _hash64(valor):
+    return int.from_bytes(hashlib.blake2b(valor.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def shingles(texto):
+    """Conjunto de trigramas de palavras (ou as próprias palavras em textos curtos)"""
+    palavras = normalizar(texto)
+    if len(palavras) < TAMANHO_SHINGLE:
+        return set(palavras)
+    return {' '.join(palavras[i:i + TAMANHO_SHINGLE]) for i in range(len(palavras) - TAMANHO_SHINGLE + 1)}
+
+
+def jaccard(a, b):
+    """Similaridade de Jaccard exata entre dois conjuntos de shingles"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _reduzir(x):
+    """x mod (2^61 - 1) para x < 2^64, sem sair de uint64"""
+    x = (x & _P) + (x >> np.uint64(61))
+    # x < p + 8: subtrai p quando x >= p (senão x - p dá a volta e o mínimo fica com x)
+    return np.minimum(x, x - _P)
+
+
+def curto_demais(texto):
+    """True se o texto tem poucos shingles para uma comparação confiável"""
+    return len(shingles(texto)) < MIN_SHINGLES
+
+
+def assinatura_minhash(texto):
+    """
+    Assinatura MinHash (NUM_PERMUTACOES valores de 32 bits): mínimo de (a*x + b) mod (2^61 - 1)
+    sobre os shingles. Calculada com NumPy numa matriz (permutações x shingles); o produto de
+    61 x 61 bits é feito em partes de 30/31 bits para não estourar uint64 (2^61 ≡ 1 mod p).
+    Retorna None para textos com menos de MIN_SHINGLES shingles.
+    """
+    valores = [_hash64(s) for s in shingles(texto)]
+    if len(valores) < MIN_SHINGLES:
+        return None
+
+    x = _reduzir(np.array(valores, dtype=np.uint64))[None, :]
+    x_alto, x_baixo = x >> np.uint64(31), x & np.uint64((1 << 31) - 1)
+
+    # a*x = a_alto*x_alto*2^62 + meio*2^31 + a_baixo*x_baixo, com 2^62 ≡ 2 e meio*2^31 ≡
+    # (meio >> 30) + (meio mod 2^30)*2^31. Cada parcela cabe em uint64 e a soma fica < 2^64.
+    meio = _A_ALTO * x_baixo + _A_BAIXO * x_alto
+    soma = _A_ALTO * x_alto * np.uint64(2)
+    soma += meio >> np.uint64(30)
+    soma += (meio & np.uint64((1 << 30) - 1)) << np.uint64(31)
+    soma += _A_BAIXO * x_baixo
+    soma += _B
+
+    minimos = _reduzir(soma).min(axis=1) & np.uint64(_MAX_HASH)
+    return array('I', minimos.astype(np.uint32).tobytes())
+
+
+def assinatura_para_bytes(assinatura):
+    return assinatura.tobytes()
+
+
+def assinatura_de_bytes(dados):
+    assinatura = array('I')
+    assinatura.frombytes(dados)
+    return assinatura
+
+
+def jaccard_estimada(a, b):
+    """Fração de posições iguais entre duas assinaturas"""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERMUTACOES
+
+
+def bandas_lsh(assinatura):
+    """Lista de (banda, bucket) da assinatura; bucket é um inteiro de 64 bits com sinal"""
+    bandas = []
+    for banda in range(BANDAS):
+        fatia = assinatura[banda * LINHAS_POR_BANDA:(banda + 1) * LINHAS_POR_BANDA]
+        digest = hashlib.blake2b(fatia.tobytes(), digest_size=8).digest()
+        bandas.append((banda, int.from_bytes(digest, 'little', signed=True)))
+    return bandas